@@ -1,12 +1,33 @@
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, extract, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.models import Message
+from bot.services.message_parser import MESSAGE_RE
+
+
+def _month_range(year: int, month: int) -> tuple[datetime, datetime]:
+    """Возвращает границы месяца [start, end) в UTC для range-условия по created_at.
+
+    month должен быть в диапазоне 1..12, иначе datetime() бросит ValueError.
+    """
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def _utc_year_month() -> tuple[ColumnElement[Any], ColumnElement[Any]]:
+    """Возвращает выражения (year, month) по created_at в UTC — в той же зоне, что и _month_range.
+
+    Без AT TIME ZONE Postgres считает EXTRACT в TimeZone сессии, и запись около полуночи
+    попала бы в список одного месяца, а в сумму соседнего.
+    """
+    created_at_utc = func.timezone("UTC", Message.created_at)
+    return extract("year", created_at_utc), extract("month", created_at_utc)
 
 
 @dataclass
@@ -36,16 +57,11 @@ async def get_user_costs_stats(session: AsyncSession, user_id: int) -> UserCosts
             last_date=None,
         )
 
-    total = Decimal("0")
-    for row in rows:
-        # Текст в формате "название сумма", берём последнее слово как сумму
-        parts = row.text.rsplit(maxsplit=1)
-        if len(parts) == 2:
-            try:
-                amount = Decimal(parts[1].replace(",", "."))
-                total += amount
-            except Exception:
-                pass
+    # Текст в формате "название сумма", строки без суммы пропускаем
+    total = sum(
+        (Decimal(m.group("amount").replace(",", ".")) for row in rows if (m := MESSAGE_RE.match(row.text))),
+        Decimal("0"),
+    )
 
     return UserCostsStats(
         total_amount=total,
@@ -67,72 +83,57 @@ async def get_user_recent_costs(
     )
     rows = result.all()
 
-    costs = []
-    for row in rows:
-        parts = row.text.rsplit(maxsplit=1)
-        if len(parts) == 2:
-            try:
-                amount = Decimal(parts[1].replace(",", "."))
-                costs.append((parts[0], amount, row.created_at))
-            except Exception:
-                pass
-
-    return costs
+    return [
+        (m.group("text"), Decimal(m.group("amount").replace(",", ".")), row.created_at)
+        for row in rows
+        if (m := MESSAGE_RE.match(row.text))
+    ]
 
 
 async def get_unique_user_ids(session: AsyncSession) -> list[int]:
     """Возвращает список уникальных user_id из таблицы сообщений."""
-    result = await session.execute(
+    # Стримим скаляры курсором, не буферизуя весь результат в драйвере
+    result = await session.stream_scalars(
         select(Message.user_id).distinct().order_by(Message.user_id)
     )
-    return list(result.scalars().all())
+    return [user_id async for user_id in result]
 
 
 async def get_user_costs_by_month(
     session: AsyncSession, user_id: int, year: int, month: int
 ) -> list[tuple[str, Decimal, datetime]]:
     """Возвращает расходы пользователя за конкретный месяц, отсортированные по дате."""
-    from sqlalchemy import extract
+    # Несуществующий месяц: пустой результат, как раньше с EXTRACT(...) = ...
+    if not 1 <= month <= 12:
+        return []
 
+    # Диапазон вместо EXTRACT(...) = ..., чтобы условие по created_at могло использовать индекс
+    start, end = _month_range(year, month)
     result = await session.execute(
         select(Message.text, Message.created_at)
         .where(Message.user_id == user_id)
-        .where(extract("year", Message.created_at) == year)
-        .where(extract("month", Message.created_at) == month)
+        .where(Message.created_at >= start, Message.created_at < end)
         .order_by(Message.created_at)
     )
     rows = result.all()
 
-    costs = []
-    for row in rows:
-        parts = row.text.rsplit(maxsplit=1)
-        if len(parts) == 2:
-            try:
-                amount = Decimal(parts[1].replace(",", "."))
-                costs.append((parts[0], amount, row.created_at))
-            except Exception:
-                pass
-
-    return costs
+    return [
+        (m.group("text"), Decimal(m.group("amount").replace(",", ".")), row.created_at)
+        for row in rows
+        if (m := MESSAGE_RE.match(row.text))
+    ]
 
 
 async def get_user_available_months(
     session: AsyncSession, user_id: int
 ) -> list[tuple[int, int]]:
     """Возвращает список (year, month) для которых есть записи, отсортированный по убыванию."""
-    from sqlalchemy import extract
-
+    year, month = _utc_year_month()
     result = await session.execute(
-        select(
-            extract("year", Message.created_at).label("year"),
-            extract("month", Message.created_at).label("month"),
-        )
+        select(year.label("year"), month.label("month"))
         .where(Message.user_id == user_id)
         .group_by("year", "month")
-        .order_by(
-            extract("year", Message.created_at).desc(),
-            extract("month", Message.created_at).desc(),
-        )
+        .order_by(year.desc(), month.desc())
     )
     rows = result.all()
 
@@ -171,7 +172,7 @@ async def save_message(
     text: str,
     created_at: datetime | None = None,
 ) -> Message:
-    """Создает объект сообщения без commit (для batch операций).
+    """Создает сообщение без commit (для batch операций).
 
     Вызывающий код должен сам делать commit.
     Это позволяет сохранять несколько сообщений атомарно в одной транзакции.
@@ -182,20 +183,15 @@ async def save_message(
         text: текст расхода
         created_at: опциональная дата создания (по умолчанию - текущее время)
     """
-    message = Message(
-        user_id=user_id,
-        text=text,
-    )
+    values: dict[str, Any] = {"user_id": user_id, "text": text}
 
-    # Если передана кастомная дата - устанавливаем её
+    # Если передана кастомная дата - устанавливаем её, иначе срабатывает server_default
     if created_at is not None:
-        message.created_at = created_at  # type: ignore[assignment]
+        values["created_at"] = created_at
 
-    session.add(message)
-    await session.flush()  # Получаем id и created_at без commit
-    await session.refresh(message)
-
-    return message
+    # INSERT ... RETURNING: id и created_at приходят за один запрос, без refresh
+    result = await session.execute(insert(Message).values(**values).returning(Message))
+    return result.scalar_one()
 
 
 @dataclass
@@ -231,8 +227,6 @@ async def get_all_costs_paginated(
     order_dir: str = "desc",
 ) -> PaginatedCosts:
     """Возвращает все расходы с пагинацией (для веб-интерфейса)."""
-    from sqlalchemy import func
-
     # Получаем общее количество записей
     count_result = await session.execute(select(func.count(Message.id)))
     total = count_result.scalar() or 0
@@ -382,45 +376,34 @@ async def get_all_users_costs_by_month(
     """Возвращает суммы расходов всех пользователей за конкретный месяц.
 
     Returns:
-        Словарь {user_id: total_amount}
+        Словарь {user_id: total_amount}; для несуществующего месяца — пустой словарь
     """
-    from sqlalchemy import extract
+    if not 1 <= month <= 12:
+        return {}
 
+    start, end = _month_range(year, month)
     result = await session.execute(
         select(Message.user_id, Message.text)
-        .where(extract("year", Message.created_at) == year)
-        .where(extract("month", Message.created_at) == month)
+        .where(Message.created_at >= start, Message.created_at < end)
     )
     rows = result.all()
 
     user_totals: dict[int, Decimal] = {}
     for row in rows:
-        user_id = row.user_id
-        parts = row.text.rsplit(maxsplit=1)
-        if len(parts) == 2:
-            try:
-                amount = Decimal(parts[1].replace(",", "."))
-                user_totals[user_id] = user_totals.get(user_id, Decimal("0")) + amount
-            except Exception:
-                pass
+        if m := MESSAGE_RE.match(row.text):
+            amount = Decimal(m.group("amount").replace(",", "."))
+            user_totals[row.user_id] = user_totals.get(row.user_id, Decimal("0")) + amount
 
     return user_totals
 
 
 async def get_available_months(session: AsyncSession) -> list[tuple[int, int]]:
     """Возвращает список (year, month) для которых есть записи (все пользователи)."""
-    from sqlalchemy import extract
-
+    year, month = _utc_year_month()
     result = await session.execute(
-        select(
-            extract("year", Message.created_at).label("year"),
-            extract("month", Message.created_at).label("month"),
-        )
+        select(year.label("year"), month.label("month"))
         .group_by("year", "month")
-        .order_by(
-            extract("year", Message.created_at).desc(),
-            extract("month", Message.created_at).desc(),
-        )
+        .order_by(year.desc(), month.desc())
     )
     rows = result.all()
 
@@ -2,10 +2,13 @@
 
 import bcrypt
 
+# bcrypt cost factor; tests lower it to the minimum to keep hashing cheap
+_BCRYPT_ROUNDS = 12
+
 
 def hash_password(plain_password: str) -> str:
     """Hash a password using bcrypt. Returns the hash as a UTF-8 string."""
-    return bcrypt.hashpw(plain_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(plain_password.encode("utf-8"), bcrypt.gensalt(rounds=_BCRYPT_ROUNDS)).decode("utf-8")
 
 
 def verify_password(plain_password: str, hashed: str) -> bool:
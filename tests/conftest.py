@@ -6,10 +6,13 @@ Otherwise subdirectory conftest imports can trigger bot.config.Settings()
 while os.environ["ENV"] is still unset, locking in ENV=dev from .env.
 """
 
+import importlib.util
 import os
 
 import pytest
 
+HAS_UVLOOP = importlib.util.find_spec("uvloop") is not None
+
 
 def pytest_configure(config):
     """Prevent running tests against production environment."""
@@ -20,3 +23,23 @@ def pytest_configure(config):
 
     # Force test environment for all tests
     os.environ["ENV"] = "test"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _fast_bcrypt():
+    """Use the minimal bcrypt cost factor: tests need the format, not the strength."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("bot.security._BCRYPT_ROUNDS", 4)
+        yield
+
+
+if HAS_UVLOOP:
+    # Without uvloop keep pytest-asyncio's default policy: asyncio.DefaultEventLoopPolicy
+    # is deprecated in Python 3.14
+
+    @pytest.fixture(scope="session")
+    def event_loop_policy():
+        """Run async tests on uvloop when it is installed (Linux/macOS)."""
+        import uvloop
+
+        return uvloop.EventLoopPolicy()
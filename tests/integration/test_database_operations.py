@@ -433,3 +433,19 @@ class TestRepositoryFunctions:
             assert len(costs) == 2
             assert costs[0][0] == "Valid"
             assert costs[1][0] == "Another"
+
+    @pytest.mark.asyncio
+    async def test_get_user_costs_by_month_respects_month_boundaries(self):
+        """Расходы за месяц не захватывают соседние месяцы (в т.ч. переход через год)."""
+        from bot.db.repositories.messages import get_user_costs_by_month
+
+        user_id = 10007
+        async with get_session() as session:
+            await save_message(session, user_id, "Ноябрь 50", created_at=datetime(2024, 11, 30, 23, 59, tzinfo=timezone.utc))
+            await save_message(session, user_id, "Начало 100", created_at=datetime(2024, 12, 1, tzinfo=timezone.utc))
+            await save_message(session, user_id, "Конец 200", created_at=datetime(2024, 12, 31, 23, 59, tzinfo=timezone.utc))
+            await save_message(session, user_id, "Январь 300", created_at=datetime(2025, 1, 1, tzinfo=timezone.utc))
+            await session.commit()
+
+            costs = await get_user_costs_by_month(session, user_id, 2024, 12)
+            assert [name for name, _, _ in costs] == ["Начало", "Конец"]
@@ -1,5 +1,12 @@
+import uuid
+from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock
+
 import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+from tests.unit.helpers import FakeSession
 
 
 @pytest.fixture
@@ -21,6 +28,12 @@ def mock_session():
     return session
 
 
+@pytest.fixture
+def fake_session():
+    """Создаёт лёгкую фейковую сессию БД для тестов репозиториев."""
+    return FakeSession()
+
+
 @pytest.fixture
 def mock_state():
     """Создаёт мок FSMContext."""
@@ -30,3 +43,66 @@ def mock_state():
     state.update_data = AsyncMock()
     state.clear = AsyncMock()
     return state
+
+
+@pytest.fixture(scope="session")
+def web_app():
+    """FastAPI-приложение веб-интерфейса."""
+    # Импорт внутри фикстуры только потому, что этот conftest грузится до pytest_configure:
+    # импорт на уровне модуля собрал бы app с ENV=prod (без dev-роута). Тестовые модули
+    # импортируют bot.web.* при сборке — это уже после ENV=test, так что app там тот же.
+    from bot.web.app import app
+
+    return app
+
+
+@pytest.fixture(scope="session")
+def asgi_transport(web_app):
+    """Общий ASGITransport поверх приложения."""
+    # ASGITransport не отправляет lifespan-события, а у app нет startup/shutdown —
+    # отдельный LifespanManager не нужен
+    return ASGITransport(app=web_app)
+
+
+@pytest_asyncio.fixture(scope="session")
+async def _shared_client(asgi_transport):
+    """Один AsyncClient поверх ASGI-приложения на всю тестовую сессию."""
+    async with AsyncClient(transport=asgi_transport, base_url="http://test", follow_redirects=False) as client:
+        yield client
+
+
+@pytest.fixture
+def client(_shared_client):
+    """Общий AsyncClient без перехода по редиректам; cookie-jar очищается после каждого теста."""
+    yield _shared_client
+    _shared_client.cookies.clear()
+
+
+@pytest.fixture
+def auth_token(request):
+    """Авторизованная сессия в auth_sessions; поля переопределяются через indirect parametrize."""
+    from bot.web.auth import auth_sessions
+
+    token = f"test-session-{uuid.uuid4().hex}"
+    auth_sessions[token] = {
+        "authenticated": True,
+        # get_session() отбрасывает сессии старше SESSION_LIFETIME, поэтому не фиксированная дата
+        "created_at": datetime.now(),
+        "csrf_token": "csrf123",
+        "user_id": 1,
+        "telegram_id": 123,
+        "user_name": "Иван",
+        "role": "user",
+        **getattr(request, "param", {}),
+    }
+    yield token
+    auth_sessions.pop(token, None)
+
+
+@pytest.fixture
+def auth_client(client, auth_token):
+    """Общий client с cookie сессии auth_token (client очищает cookie-jar после теста)."""
+    from bot.web.auth import SESSION_COOKIE
+
+    client.cookies.set(SESSION_COOKIE, auth_token)
+    return client
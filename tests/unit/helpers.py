@@ -0,0 +1,40 @@
+"""Общие хелперы unit-тестов: лёгкие замены моделей, сессий и async-функций."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+_USER_CREATED_AT = datetime(2026, 1, 1, 12, 0)
+
+
+def make_user(id=1, telegram_id=123, name="Иван", role="user", password_hash=None):
+    """Лёгкая замена модели User для репозиториев, веб-роутов и шаблонов."""
+    return SimpleNamespace(
+        id=id,
+        telegram_id=telegram_id,
+        name=name,
+        role=role,
+        password_hash=password_hash,
+        created_at=_USER_CREATED_AT,
+    )
+
+
+def aret(value):
+    """Plain coroutine function returning value: a cheap stand-in for AsyncMock(return_value=value)."""
+
+    async def _stub(*args, **kwargs):
+        return value
+
+    return _stub
+
+
+class FakeSession:
+    """Лёгкая замена AsyncSession: только методы, которые вызывают репозитории."""
+
+    def __init__(self):
+        self.execute = AsyncMock()
+        self.stream_scalars = AsyncMock()
+        self.add = MagicMock()  # add() синхронный в SQLAlchemy
+        self.flush = AsyncMock()
+        self.refresh = AsyncMock()
+        self.commit = AsyncMock()
@@ -1,61 +1,58 @@
 """Unit tests for auth routes (login/logout)."""
 
+import time
 from contextlib import asynccontextmanager
-from datetime import datetime
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock
 
 import pytest
-from httpx import ASGITransport, AsyncClient
 
+import bot.web.auth as auth_mod
+from bot.config import Environment, settings
 from bot.security import hash_password
-from bot.web.app import app
-from bot.web.auth import SESSION_COOKIE, auth_sessions
+from bot.web.auth import MAX_LOGIN_ATTEMPTS, SESSION_COOKIE, auth_sessions, login_attempts
+from tests.unit.helpers import aret, make_user
 
 
-def _make_user(id=1, telegram_id=123, name="Иван", role="user", password_hash=None):
-    user = MagicMock()
-    user.id = id
-    user.telegram_id = telegram_id
-    user.name = name
-    user.role = role
-    user.password_hash = password_hash
-    return user
+@pytest.fixture(autouse=True)
+def _patch_db_session(monkeypatch):
+    """Every auth route test runs against its own fresh mock DB session."""
+    session = AsyncMock()
 
+    @asynccontextmanager
+    async def _mock_db_session():
+        yield session
 
-@asynccontextmanager
-async def _mock_db_session():
-    yield AsyncMock()
+    monkeypatch.setattr(auth_mod, "get_db_session", _mock_db_session)
+    return session
+
+
+@pytest.fixture(autouse=True)
+def _patch_settings(monkeypatch):
+    """Pin the settings the login flow reads, independent of the local .env."""
+    monkeypatch.setattr(settings, "web_root_path", "")
+    monkeypatch.setattr(settings, "env", Environment.test)
+    monkeypatch.setattr(settings, "admin_telegram_id", None)
 
 
 class TestLoginPage:
     """Tests for GET /login."""
 
-    @pytest.mark.asyncio
-    async def test_returns_200_when_not_authenticated(self):
+    async def test_returns_200_when_not_authenticated(self, client, monkeypatch):
         """Login page returns 200 for unauthenticated users."""
-        users = [_make_user(1, 123, "Иван", "user")]
+        users = [make_user(1, 123, "Иван", "user")]
 
-        with (
-            patch("bot.web.auth.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.auth.get_all_users", new=AsyncMock(return_value=users)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.get("/login")
+        monkeypatch.setattr(auth_mod, "get_all_users", aret(users))
+
+        response = await client.get("/login")
 
         assert response.status_code == 200
-        assert "Пароль" in response.text
-        assert "Пользователь" in response.text  # User dropdown label
+        assert "Пароль".encode() in response.content
+        assert "Пользователь".encode() in response.content  # User dropdown label
 
-    @pytest.mark.asyncio
-    async def test_redirects_when_already_authenticated(self):
+    async def test_redirects_when_already_authenticated(self, auth_client):
         """Authenticated user is redirected to /costs."""
-        token = "auth-login-page-test"
-        auth_sessions[token] = {"authenticated": True, "created_at": datetime.now(), "csrf_token": "x"}
-
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/login", cookies={SESSION_COOKIE: token}, follow_redirects=False)
+        response = await auth_client.get("/login")
 
-        auth_sessions.pop(token, None)
         assert response.status_code == 303
         assert "/costs" in response.headers["location"]
 
@@ -63,26 +60,16 @@ class TestLoginPage:
 class TestLoginPost:
     """Tests for POST /login."""
 
-    @pytest.mark.asyncio
-    async def test_login_with_correct_password(self):
+    async def test_login_with_correct_password(self, client, monkeypatch):
         """Correct password and valid user creates session and redirects."""
         hashed = hash_password("secret")
-        user = _make_user(1, 123, "Иван", "user", password_hash=hashed)
+        user = make_user(1, 123, "Иван", "user", password_hash=hashed)
         users = [user]
 
-        with (
-            patch("bot.web.auth.settings") as mock_settings,
-            patch("bot.web.auth.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.auth.get_all_users", new=AsyncMock(return_value=users)),
-            patch("bot.web.auth.get_user_by_telegram_id", new=AsyncMock(return_value=user)),
-        ):
-            mock_settings.web_root_path = ""
-            mock_settings.env = "test"
+        monkeypatch.setattr(auth_mod, "get_all_users", aret(users))
+        monkeypatch.setattr(auth_mod, "get_user_by_telegram_id", aret(user))
 
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/login", data={"password": "secret", "user_id": "123"}, follow_redirects=False
-                )
+        response = await client.post("/login", data={"password": "secret", "user_id": "123"})
 
         assert response.status_code == 303
         assert "/costs" in response.headers["location"]
@@ -98,158 +85,93 @@ class TestLoginPost:
         # Cleanup session
         auth_sessions.pop(session_token, None)
 
-    @pytest.mark.asyncio
-    async def test_login_with_wrong_password(self):
+    async def test_login_with_wrong_password(self, client, monkeypatch):
         """Wrong password returns login page with error."""
         hashed = hash_password("secret")
-        user = _make_user(1, 123, "Иван", "user", password_hash=hashed)
+        user = make_user(1, 123, "Иван", "user", password_hash=hashed)
         users = [user]
 
-        with (
-            patch("bot.web.auth.settings") as mock_settings,
-            patch("bot.web.auth.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.auth.get_all_users", new=AsyncMock(return_value=users)),
-            patch("bot.web.auth.get_user_by_telegram_id", new=AsyncMock(return_value=user)),
-        ):
-            mock_settings.web_root_path = ""
-            mock_settings.env = "test"
+        monkeypatch.setattr(auth_mod, "get_all_users", aret(users))
+        monkeypatch.setattr(auth_mod, "get_user_by_telegram_id", aret(user))
 
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post("/login", data={"password": "wrong", "user_id": "123"})
+        response = await client.post("/login", data={"password": "wrong", "user_id": "123"})
 
         assert response.status_code == 200
-        assert "Неверный пароль" in response.text
+        assert "Неверный пароль".encode() in response.content
 
-    @pytest.mark.asyncio
-    async def test_login_with_invalid_user_id(self):
+    async def test_login_with_invalid_user_id(self, client, monkeypatch):
         """Invalid user_id returns login page with error."""
-        users = [_make_user(1, 123, "Иван", "user")]
+        users = [make_user(1, 123, "Иван", "user")]
 
-        with (
-            patch("bot.web.auth.settings") as mock_settings,
-            patch("bot.web.auth.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.auth.get_all_users", new=AsyncMock(return_value=users)),
-            patch("bot.web.auth.get_user_by_telegram_id", new=AsyncMock(return_value=None)),
-        ):
-            mock_settings.web_password = "secret"
-            mock_settings.web_root_path = ""
-            mock_settings.env = "test"
+        monkeypatch.setattr(auth_mod, "get_all_users", aret(users))
+        monkeypatch.setattr(auth_mod, "get_user_by_telegram_id", aret(None))
 
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post("/login", data={"password": "secret", "user_id": "999"})
+        response = await client.post("/login", data={"password": "secret", "user_id": "999"})
 
         assert response.status_code == 200
-        assert "Пользователь не найден" in response.text
+        assert "Пользователь не найден".encode() in response.content
 
-    @pytest.mark.asyncio
-    async def test_login_user_without_password_hash(self):
+    async def test_login_user_without_password_hash(self, client, monkeypatch):
         """Shows error when user has no password_hash set."""
-        user = _make_user(1, 123, "Иван", "user", password_hash=None)
+        user = make_user(1, 123, "Иван", "user", password_hash=None)
         users = [user]
 
-        with (
-            patch("bot.web.auth.settings") as mock_settings,
-            patch("bot.web.auth.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.auth.get_all_users", new=AsyncMock(return_value=users)),
-            patch("bot.web.auth.get_user_by_telegram_id", new=AsyncMock(return_value=user)),
-        ):
-            mock_settings.web_root_path = ""
-            mock_settings.env = "test"
+        monkeypatch.setattr(auth_mod, "get_all_users", aret(users))
+        monkeypatch.setattr(auth_mod, "get_user_by_telegram_id", aret(user))
 
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post("/login", data={"password": "anything", "user_id": "123"})
+        response = await client.post("/login", data={"password": "anything", "user_id": "123"})
 
         assert response.status_code == 200
-        assert "Пароль для этого пользователя не установлен" in response.text
+        assert "Пароль для этого пользователя не установлен".encode() in response.content
 
-    @pytest.mark.asyncio
-    async def test_login_rate_limiting(self):
+    async def test_login_rate_limiting(self, client, monkeypatch):
         """After MAX_LOGIN_ATTEMPTS failures, login is rate-limited."""
-        import time
-
-        from bot.web.auth import MAX_LOGIN_ATTEMPTS, login_attempts
-
         ip = "127.0.0.1"
-        users = [_make_user(1, 123, "Иван", "user")]
+        users = [make_user(1, 123, "Иван", "user")]
 
-        with (
-            patch("bot.web.auth.settings") as mock_settings,
-            patch("bot.web.auth.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.auth.get_all_users", new=AsyncMock(return_value=users)),
-        ):
-            mock_settings.web_root_path = ""
-            mock_settings.env = "test"
+        monkeypatch.setattr(auth_mod, "get_all_users", aret(users))
 
-            # Fill up rate limit
-            login_attempts[ip] = [time.time() for _ in range(MAX_LOGIN_ATTEMPTS)]
+        # Fill up rate limit
+        login_attempts[ip] = [time.time() for _ in range(MAX_LOGIN_ATTEMPTS)]
 
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post("/login", data={"password": "wrong", "user_id": "123"})
+        response = await client.post("/login", data={"password": "wrong", "user_id": "123"})
 
         login_attempts.pop(ip, None)
         assert response.status_code == 200
-        assert "Слишком много попыток" in response.text
-
+        assert "Слишком много попыток".encode() in response.content
 
-    @pytest.mark.asyncio
-    async def test_login_auto_promotes_admin_telegram_id(self):
+    async def test_login_auto_promotes_admin_telegram_id(self, client, monkeypatch, _patch_db_session):
         """User matching ADMIN_TELEGRAM_ID is auto-promoted to admin."""
         hashed = hash_password("secret")
-        user = _make_user(1, 555, "Будущий Админ", "user", password_hash=hashed)
+        user = make_user(1, 555, "Будущий Админ", "user", password_hash=hashed)
         users = [user]
 
-        mock_session = AsyncMock()
+        monkeypatch.setattr(auth_mod, "get_all_users", aret(users))
+        monkeypatch.setattr(auth_mod, "get_user_by_telegram_id", aret(user))
+        monkeypatch.setattr(settings, "admin_telegram_id", 555)
 
-        @asynccontextmanager
-        async def mock_db():
-            yield mock_session
-
-        with (
-            patch("bot.web.auth.settings") as mock_settings,
-            patch("bot.web.auth.get_db_session", side_effect=mock_db),
-            patch("bot.web.auth.get_all_users", new=AsyncMock(return_value=users)),
-            patch("bot.web.auth.get_user_by_telegram_id", new=AsyncMock(return_value=user)),
-        ):
-            mock_settings.web_root_path = ""
-            mock_settings.env = "test"
-            mock_settings.admin_telegram_id = 555
-
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/login", data={"password": "secret", "user_id": "555"}, follow_redirects=False
-                )
+        response = await client.post("/login", data={"password": "secret", "user_id": "555"})
 
         assert response.status_code == 303
         # User role was updated
         assert user.role == "admin"
-        mock_session.commit.assert_called_once()
+        _patch_db_session.commit.assert_called_once()
 
         # Session stores admin role
         session_token = response.cookies[SESSION_COOKIE]
         assert auth_sessions[session_token]["role"] == "admin"
         auth_sessions.pop(session_token, None)
 
-    @pytest.mark.asyncio
-    async def test_login_no_promotion_without_admin_telegram_id(self):
+    async def test_login_no_promotion_without_admin_telegram_id(self, client, monkeypatch):
         """Without ADMIN_TELEGRAM_ID, no auto-promotion happens."""
         hashed = hash_password("secret")
-        user = _make_user(1, 123, "Иван", "user", password_hash=hashed)
+        user = make_user(1, 123, "Иван", "user", password_hash=hashed)
         users = [user]
 
-        with (
-            patch("bot.web.auth.settings") as mock_settings,
-            patch("bot.web.auth.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.auth.get_all_users", new=AsyncMock(return_value=users)),
-            patch("bot.web.auth.get_user_by_telegram_id", new=AsyncMock(return_value=user)),
-        ):
-            mock_settings.web_root_path = ""
-            mock_settings.env = "test"
-            mock_settings.admin_telegram_id = None
-
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/login", data={"password": "secret", "user_id": "123"}, follow_redirects=False
-                )
+        monkeypatch.setattr(auth_mod, "get_all_users", aret(users))
+        monkeypatch.setattr(auth_mod, "get_user_by_telegram_id", aret(user))
+
+        response = await client.post("/login", data={"password": "secret", "user_id": "123"})
 
         assert response.status_code == 303
         assert user.role == "user"
@@ -262,24 +184,17 @@ class TestLoginPost:
 class TestLogout:
     """Tests for GET /logout."""
 
-    @pytest.mark.asyncio
-    async def test_logout_deletes_session_and_redirects(self):
+    async def test_logout_deletes_session_and_redirects(self, auth_client, auth_token):
         """Logout removes session and redirects to /login."""
-        token = "logout-test-session"
-        auth_sessions[token] = {"authenticated": True, "created_at": datetime.now(), "csrf_token": "x"}
-
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/logout", cookies={SESSION_COOKIE: token}, follow_redirects=False)
+        response = await auth_client.get("/logout")
 
         assert response.status_code == 303
         assert "/login" in response.headers["location"]
-        assert token not in auth_sessions
+        assert auth_token not in auth_sessions
 
-    @pytest.mark.asyncio
-    async def test_logout_without_session_still_redirects(self):
+    async def test_logout_without_session_still_redirects(self, client):
         """Logout without active session still redirects cleanly."""
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/logout", follow_redirects=False)
+        response = await client.get("/logout")
 
         assert response.status_code == 303
         assert "/login" in response.headers["location"]
@@ -288,11 +203,9 @@ class TestLogout:
 class TestRootRedirect:
     """Tests for GET / root redirect."""
 
-    @pytest.mark.asyncio
-    async def test_root_redirects_to_costs(self):
+    async def test_root_redirects_to_costs(self, client):
         """Root / redirects to /costs."""
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/", follow_redirects=False)
+        response = await client.get("/")
 
         assert response.status_code == 307
         assert "/costs" in response.headers["location"]
@@ -301,51 +214,27 @@ class TestRootRedirect:
 class TestLogsRoute:
     """Tests for GET /logs."""
 
-    @pytest.mark.asyncio
-    async def test_logs_redirects_when_not_authenticated(self):
+    async def test_logs_redirects_when_not_authenticated(self, client):
         """Unauthenticated request redirects to /login."""
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/logs", follow_redirects=False)
+        response = await client.get("/logs")
 
         assert response.status_code == 303
         assert "/login" in response.headers["location"]
 
-    @pytest.mark.asyncio
-    async def test_logs_returns_200_when_admin(self):
+    @pytest.mark.parametrize("auth_token", [{"role": "admin", "telegram_id": 111, "user_name": "Админ"}], indirect=True)
+    async def test_logs_returns_200_when_admin(self, auth_client):
         """Admin request returns logs placeholder page."""
-        token = "logs-admin-test"
-        auth_sessions[token] = {
-            "authenticated": True,
-            "created_at": datetime.now(),
-            "csrf_token": "x",
-            "role": "admin",
-            "telegram_id": 111,
-            "user_name": "Админ",
-        }
-
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/logs", cookies={SESSION_COOKIE: token})
-
-        auth_sessions.pop(token, None)
+        response = await auth_client.get("/logs")
+
         assert response.status_code == 200
-        assert "Раздел пока не реализован" in response.text
+        assert "Раздел пока не реализован".encode() in response.content
 
-    @pytest.mark.asyncio
-    async def test_logs_redirects_non_admin_to_costs(self):
+    @pytest.mark.parametrize(
+        "auth_token", [{"role": "user", "telegram_id": 222, "user_name": "Пользователь"}], indirect=True
+    )
+    async def test_logs_redirects_non_admin_to_costs(self, auth_client):
         """Non-admin user is redirected from /logs to /costs."""
-        token = "logs-user-test"
-        auth_sessions[token] = {
-            "authenticated": True,
-            "created_at": datetime.now(),
-            "csrf_token": "x",
-            "role": "user",
-            "telegram_id": 222,
-            "user_name": "Пользователь",
-        }
-
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/logs", cookies={SESSION_COOKIE: token}, follow_redirects=False)
-
-        auth_sessions.pop(token, None)
+        response = await auth_client.get("/logs")
+
         assert response.status_code == 303
         assert "/costs" in response.headers["location"]
@@ -1,14 +1,17 @@
 """Tests for messages repository."""
 
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
+from bot.db.models import Message
 from bot.db.repositories.messages import (
     UserCostsStats,
     delete_messages_by_ids,
+    get_all_users_costs_by_month,
+    get_available_months,
     get_unique_user_ids,
     get_user_available_months,
     get_user_costs_by_month,
@@ -18,14 +21,6 @@ from bot.db.repositories.messages import (
 )
 
 
-@pytest.fixture
-def mock_session():
-    """Create mock async session."""
-    session = AsyncMock()
-    session.add = MagicMock()  # add() is synchronous in SQLAlchemy
-    return session
-
-
 class TestUserCostsStats:
     """Tests for UserCostsStats dataclass."""
 
@@ -56,25 +51,44 @@ class TestUserCostsStats:
         assert stats.last_date is None
 
 
-class TestGetUserCostsStats:
-    """Tests for get_user_costs_stats function."""
+_EMPTY_RESULT_CASES = [
+    (
+        get_user_costs_stats,
+        {"user_id": 123},
+        UserCostsStats(total_amount=Decimal("0"), count=0, first_date=None, last_date=None),
+    ),
+    (get_user_recent_costs, {"user_id": 123}, []),
+    (get_unique_user_ids, {}, []),
+    (get_user_costs_by_month, {"user_id": 123, "year": 2026, "month": 1}, []),
+    (get_user_available_months, {"user_id": 123}, []),
+    (get_all_users_costs_by_month, {"year": 2026, "month": 1}, {}),
+    (get_available_months, {}, []),
+]
+
+
+class TestEmptyResult:
+    """Readers return an empty value when the query yields no rows."""
 
     @pytest.mark.asyncio
-    async def test_empty_result(self, mock_session):
-        """Returns zero stats when no messages."""
+    @pytest.mark.parametrize(
+        ("func", "kwargs", "expected"),
+        _EMPTY_RESULT_CASES,
+        ids=[func.__name__ for func, _, _ in _EMPTY_RESULT_CASES],
+    )
+    async def test_empty_result(self, fake_session, func, kwargs, expected):
+        """Returns zero stats / empty collection when no messages."""
         mock_result = MagicMock()
         mock_result.all.return_value = []
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        stats = await get_user_costs_stats(mock_session, user_id=123)
+        assert await func(fake_session, **kwargs) == expected
 
-        assert stats.total_amount == Decimal("0")
-        assert stats.count == 0
-        assert stats.first_date is None
-        assert stats.last_date is None
+
+class TestGetUserCostsStats:
+    """Tests for get_user_costs_stats function."""
 
     @pytest.mark.asyncio
-    async def test_calculates_total(self, mock_session):
+    async def test_calculates_total(self, fake_session):
         """Calculates total from message texts."""
         now = datetime.now()
         mock_result = MagicMock()
@@ -83,15 +97,15 @@ class TestGetUserCostsStats:
             MagicMock(text="Хлеб 50.50", created_at=now),
             MagicMock(text="Сыр 200,25", created_at=now),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        stats = await get_user_costs_stats(mock_session, user_id=123)
+        stats = await get_user_costs_stats(fake_session, user_id=123)
 
         assert stats.total_amount == Decimal("350.75")
         assert stats.count == 3
 
     @pytest.mark.asyncio
-    async def test_handles_invalid_amount(self, mock_session):
+    async def test_handles_invalid_amount(self, fake_session):
         """Skips messages with invalid amount format."""
         now = datetime.now()
         mock_result = MagicMock()
@@ -100,15 +114,15 @@ class TestGetUserCostsStats:
             MagicMock(text="Невалидная строка", created_at=now),
             MagicMock(text="Хлеб abc", created_at=now),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        stats = await get_user_costs_stats(mock_session, user_id=123)
+        stats = await get_user_costs_stats(fake_session, user_id=123)
 
         assert stats.total_amount == Decimal("100")
         assert stats.count == 3  # count includes all rows
 
     @pytest.mark.asyncio
-    async def test_returns_first_and_last_dates(self, mock_session):
+    async def test_returns_first_and_last_dates(self, fake_session):
         """Returns correct first and last dates."""
         first_date = datetime(2026, 1, 1, 10, 0)
         last_date = datetime(2026, 1, 31, 20, 0)
@@ -118,9 +132,9 @@ class TestGetUserCostsStats:
             MagicMock(text="Хлеб 50", created_at=datetime(2026, 1, 15)),
             MagicMock(text="Сыр 200", created_at=last_date),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        stats = await get_user_costs_stats(mock_session, user_id=123)
+        stats = await get_user_costs_stats(fake_session, user_id=123)
 
         assert stats.first_date == first_date
         assert stats.last_date == last_date
@@ -130,18 +144,7 @@ class TestGetUserRecentCosts:
     """Tests for get_user_recent_costs function."""
 
     @pytest.mark.asyncio
-    async def test_empty_result(self, mock_session):
-        """Returns empty list when no messages."""
-        mock_result = MagicMock()
-        mock_result.all.return_value = []
-        mock_session.execute.return_value = mock_result
-
-        costs = await get_user_recent_costs(mock_session, user_id=123)
-
-        assert costs == []
-
-    @pytest.mark.asyncio
-    async def test_parses_costs(self, mock_session):
+    async def test_parses_costs(self, fake_session):
         """Parses cost name and amount from text."""
         now = datetime.now()
         mock_result = MagicMock()
@@ -149,16 +152,16 @@ class TestGetUserRecentCosts:
             MagicMock(text="Молоко 100", created_at=now),
             MagicMock(text="Хлеб белый 50.50", created_at=now),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        costs = await get_user_recent_costs(mock_session, user_id=123)
+        costs = await get_user_recent_costs(fake_session, user_id=123)
 
         assert len(costs) == 2
         assert costs[0] == ("Молоко", Decimal("100"), now)
         assert costs[1] == ("Хлеб белый", Decimal("50.50"), now)
 
     @pytest.mark.asyncio
-    async def test_skips_invalid_format(self, mock_session):
+    async def test_skips_invalid_format(self, fake_session):
         """Skips messages that can't be parsed."""
         now = datetime.now()
         mock_result = MagicMock()
@@ -167,24 +170,24 @@ class TestGetUserRecentCosts:
             MagicMock(text="Невалидная", created_at=now),
             MagicMock(text="Хлеб abc", created_at=now),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        costs = await get_user_recent_costs(mock_session, user_id=123)
+        costs = await get_user_recent_costs(fake_session, user_id=123)
 
         assert len(costs) == 1
         assert costs[0][0] == "Молоко"
 
     @pytest.mark.asyncio
-    async def test_handles_comma_decimal(self, mock_session):
+    async def test_handles_comma_decimal(self, fake_session):
         """Handles comma as decimal separator."""
         now = datetime.now()
         mock_result = MagicMock()
         mock_result.all.return_value = [
             MagicMock(text="Молоко 100,50", created_at=now),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        costs = await get_user_recent_costs(mock_session, user_id=123)
+        costs = await get_user_recent_costs(fake_session, user_id=123)
 
         assert costs[0][1] == Decimal("100.50")
 
@@ -193,44 +196,31 @@ class TestGetUniqueUserIds:
     """Tests for get_unique_user_ids function."""
 
     @pytest.mark.asyncio
-    async def test_empty_result(self, mock_session):
-        """Returns empty list when no users."""
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = []
-        mock_session.execute.return_value = mock_result
-
-        user_ids = await get_unique_user_ids(mock_session)
-
-        assert user_ids == []
-
-    @pytest.mark.asyncio
-    async def test_returns_user_ids(self, mock_session):
-        """Returns list of unique user IDs."""
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [123, 456, 789]
-        mock_session.execute.return_value = mock_result
+    async def test_returns_user_ids(self, fake_session):
+        """Returns list of unique user IDs streamed from the cursor."""
+        fake_session.stream_scalars.return_value.__aiter__.return_value = [123, 456, 789]
 
-        user_ids = await get_unique_user_ids(mock_session)
+        user_ids = await get_unique_user_ids(fake_session)
 
         assert user_ids == [123, 456, 789]
+        fake_session.stream_scalars.assert_called_once()
+        fake_session.execute.assert_not_called()
 
 
 class TestGetUserCostsByMonth:
     """Tests for get_user_costs_by_month function."""
 
     @pytest.mark.asyncio
-    async def test_empty_result(self, mock_session):
-        """Returns empty list when no costs for month."""
-        mock_result = MagicMock()
-        mock_result.all.return_value = []
-        mock_session.execute.return_value = mock_result
-
-        costs = await get_user_costs_by_month(mock_session, user_id=123, year=2026, month=1)
+    @pytest.mark.parametrize("month", [0, 13])
+    async def test_returns_empty_for_invalid_month(self, fake_session, month):
+        """Out-of-range month yields an empty list without querying the DB."""
+        costs = await get_user_costs_by_month(fake_session, user_id=123, year=2026, month=month)
 
         assert costs == []
+        fake_session.execute.assert_not_called()
 
     @pytest.mark.asyncio
-    async def test_returns_costs_for_month(self, mock_session):
+    async def test_returns_costs_for_month(self, fake_session):
         """Returns parsed costs for specified month."""
         jan_date = datetime(2026, 1, 15)
         mock_result = MagicMock()
@@ -238,16 +228,37 @@ class TestGetUserCostsByMonth:
             MagicMock(text="Молоко 100", created_at=jan_date),
             MagicMock(text="Хлеб 50", created_at=jan_date),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        costs = await get_user_costs_by_month(mock_session, user_id=123, year=2026, month=1)
+        costs = await get_user_costs_by_month(fake_session, user_id=123, year=2026, month=1)
 
         assert len(costs) == 2
         assert costs[0] == ("Молоко", Decimal("100"), jan_date)
         assert costs[1] == ("Хлеб", Decimal("50"), jan_date)
 
     @pytest.mark.asyncio
-    async def test_skips_invalid_format(self, mock_session):
+    @pytest.mark.parametrize(
+        ("year", "month", "start", "end"),
+        [
+            (2026, 1, datetime(2026, 1, 1, tzinfo=timezone.utc), datetime(2026, 2, 1, tzinfo=timezone.utc)),
+            (2025, 12, datetime(2025, 12, 1, tzinfo=timezone.utc), datetime(2026, 1, 1, tzinfo=timezone.utc)),
+        ],
+    )
+    async def test_filters_by_created_at_range(self, fake_session, year, month, start, end):
+        """Filters with a created_at range instead of EXTRACT (index-friendly)."""
+        mock_result = MagicMock()
+        mock_result.all.return_value = []
+        fake_session.execute.return_value = mock_result
+
+        await get_user_costs_by_month(fake_session, user_id=123, year=year, month=month)
+
+        compiled = fake_session.execute.call_args[0][0].compile()
+        assert "EXTRACT" not in str(compiled).upper()
+        assert start in compiled.params.values()
+        assert end in compiled.params.values()
+
+    @pytest.mark.asyncio
+    async def test_skips_invalid_format(self, fake_session):
         """Skips messages with invalid format."""
         jan_date = datetime(2026, 1, 15)
         mock_result = MagicMock()
@@ -255,9 +266,9 @@ class TestGetUserCostsByMonth:
             MagicMock(text="Молоко 100", created_at=jan_date),
             MagicMock(text="Невалидная строка", created_at=jan_date),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        costs = await get_user_costs_by_month(mock_session, user_id=123, year=2026, month=1)
+        costs = await get_user_costs_by_month(fake_session, user_id=123, year=2026, month=1)
 
         assert len(costs) == 1
 
@@ -266,18 +277,7 @@ class TestGetUserAvailableMonths:
     """Tests for get_user_available_months function."""
 
     @pytest.mark.asyncio
-    async def test_empty_result(self, mock_session):
-        """Returns empty list when no data."""
-        mock_result = MagicMock()
-        mock_result.all.return_value = []
-        mock_session.execute.return_value = mock_result
-
-        months = await get_user_available_months(mock_session, user_id=123)
-
-        assert months == []
-
-    @pytest.mark.asyncio
-    async def test_returns_year_month_tuples(self, mock_session):
+    async def test_returns_year_month_tuples(self, fake_session):
         """Returns list of (year, month) tuples."""
         mock_result = MagicMock()
         mock_result.all.return_value = [
@@ -285,61 +285,74 @@ class TestGetUserAvailableMonths:
             MagicMock(year=2025, month=12),
             MagicMock(year=2025, month=11),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        months = await get_user_available_months(mock_session, user_id=123)
+        months = await get_user_available_months(fake_session, user_id=123)
 
         assert months == [(2026, 1), (2025, 12), (2025, 11)]
 
     @pytest.mark.asyncio
-    async def test_converts_to_int(self, mock_session):
+    async def test_converts_to_int(self, fake_session):
         """Converts year and month to int."""
         mock_result = MagicMock()
         mock_result.all.return_value = [
             MagicMock(year=2026.0, month=1.0),  # floats from DB
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        months = await get_user_available_months(mock_session, user_id=123)
+        months = await get_user_available_months(fake_session, user_id=123)
 
         assert months == [(2026, 1)]
         assert isinstance(months[0][0], int)
         assert isinstance(months[0][1], int)
 
+    @pytest.mark.asyncio
+    async def test_extracts_month_in_utc(self, fake_session):
+        """Extracts year/month from created_at in UTC, matching the monthly totals range."""
+        mock_result = MagicMock()
+        mock_result.all.return_value = []
+        fake_session.execute.return_value = mock_result
+
+        await get_user_available_months(fake_session, user_id=123)
+
+        compiled = fake_session.execute.call_args[0][0].compile()
+        assert "timezone(" in str(compiled)
+        assert "UTC" in compiled.params.values()
+
 
 class TestDeleteMessagesByIds:
     """Tests for delete_messages_by_ids function."""
 
     @pytest.mark.asyncio
-    async def test_returns_deleted_count(self, mock_session):
+    async def test_returns_deleted_count(self, fake_session):
         """Returns number of deleted rows."""
         mock_result = MagicMock()
         mock_result.rowcount = 3
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        count = await delete_messages_by_ids(mock_session, message_ids=[1, 2, 3], user_id=123)
+        count = await delete_messages_by_ids(fake_session, message_ids=[1, 2, 3], user_id=123)
 
         assert count == 3
 
     @pytest.mark.asyncio
-    async def test_returns_zero_when_none(self, mock_session):
+    async def test_returns_zero_when_none(self, fake_session):
         """Returns 0 when rowcount is None."""
         mock_result = MagicMock()
         mock_result.rowcount = None
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        count = await delete_messages_by_ids(mock_session, message_ids=[1, 2, 3], user_id=123)
+        count = await delete_messages_by_ids(fake_session, message_ids=[1, 2, 3], user_id=123)
 
         assert count == 0
 
     @pytest.mark.asyncio
-    async def test_empty_ids_list(self, mock_session):
+    async def test_empty_ids_list(self, fake_session):
         """Handles empty IDs list."""
         mock_result = MagicMock()
         mock_result.rowcount = 0
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        count = await delete_messages_by_ids(mock_session, message_ids=[], user_id=123)
+        count = await delete_messages_by_ids(fake_session, message_ids=[], user_id=123)
 
         assert count == 0
 
@@ -348,74 +361,86 @@ class TestSaveMessage:
     """Tests for save_message function."""
 
     @pytest.mark.asyncio
-    async def test_creates_message(self, mock_session):
-        """Creates message with user_id and text."""
-        mock_session.flush = AsyncMock()
-        mock_session.refresh = AsyncMock()
+    async def test_creates_message(self, fake_session):
+        """Inserts message with user_id and text in a single RETURNING query."""
+        saved = Message(id=1, user_id=123, text="Молоко 100")
+        mock_result = MagicMock()
+        mock_result.scalar_one.return_value = saved
+        fake_session.execute.return_value = mock_result
 
-        message = await save_message(mock_session, user_id=123, text="Молоко 100")
+        message = await save_message(fake_session, user_id=123, text="Молоко 100")
 
-        assert message.user_id == 123
-        assert message.text == "Молоко 100"
-        mock_session.add.assert_called_once()
-        mock_session.flush.assert_called_once()
-        mock_session.refresh.assert_called_once()
+        assert message is saved
+        fake_session.execute.assert_called_once()
+        params = fake_session.execute.call_args[0][0].compile().params
+        assert params["user_id"] == 123
+        assert params["text"] == "Молоко 100"
+        assert "created_at" not in params  # server_default
+        fake_session.add.assert_not_called()
+        fake_session.flush.assert_not_called()
+        fake_session.refresh.assert_not_called()
 
     @pytest.mark.asyncio
-    async def test_sets_custom_created_at(self, mock_session):
-        """Sets custom created_at when provided."""
-        mock_session.flush = AsyncMock()
-        mock_session.refresh = AsyncMock()
+    async def test_sets_custom_created_at(self, fake_session):
+        """Passes custom created_at into INSERT when provided."""
         custom_date = datetime(2026, 1, 15, 10, 30)
+        saved = Message(id=1, user_id=123, text="Молоко 100", created_at=custom_date)
+        mock_result = MagicMock()
+        mock_result.scalar_one.return_value = saved
+        fake_session.execute.return_value = mock_result
 
         message = await save_message(
-            mock_session,
+            fake_session,
             user_id=123,
             text="Молоко 100",
             created_at=custom_date,
         )
 
-        assert message.created_at == custom_date
+        assert message is saved
+        params = fake_session.execute.call_args[0][0].compile().params
+        assert params["created_at"] == custom_date
 
     @pytest.mark.asyncio
-    async def test_no_commit_called(self, mock_session):
+    async def test_no_commit_called(self, fake_session):
         """Does not call commit (caller responsibility)."""
-        mock_session.flush = AsyncMock()
-        mock_session.refresh = AsyncMock()
-        mock_session.commit = AsyncMock()
+        saved = Message(id=1, user_id=123, text="Молоко 100")
+        mock_result = MagicMock()
+        mock_result.scalar_one.return_value = saved
+        fake_session.execute.return_value = mock_result
 
-        await save_message(mock_session, user_id=123, text="Молоко 100")
+        message = await save_message(fake_session, user_id=123, text="Молоко 100")
 
-        mock_session.commit.assert_not_called()
+        assert message is saved
+        fake_session.commit.assert_not_called()
 
 
 class TestBulkUpdateMessagesUser:
     """Tests for bulk_update_messages_user function."""
 
     @pytest.mark.asyncio
-    async def test_updates_user_for_given_ids(self, mock_session):
+    async def test_updates_user_for_given_ids(self, fake_session):
         """Updates user_id for messages with specified IDs."""
         from bot.db.repositories.messages import bulk_update_messages_user
 
         result_mock = MagicMock()
         result_mock.rowcount = 3
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        fake_session.execute = AsyncMock(return_value=result_mock)
 
-        count = await bulk_update_messages_user(mock_session, [1, 2, 3], new_user_id=42)
+        count = await bulk_update_messages_user(fake_session, [1, 2, 3], new_user_id=42)
 
         assert count == 3
-        mock_session.execute.assert_called_once()
+        fake_session.execute.assert_called_once()
 
     @pytest.mark.asyncio
-    async def test_returns_zero_when_no_rows_updated(self, mock_session):
+    async def test_returns_zero_when_no_rows_updated(self, fake_session):
         """Returns 0 when no rows were updated."""
         from bot.db.repositories.messages import bulk_update_messages_user
 
         result_mock = MagicMock()
         result_mock.rowcount = 0
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        fake_session.execute = AsyncMock(return_value=result_mock)
 
-        count = await bulk_update_messages_user(mock_session, [999], new_user_id=42)
+        count = await bulk_update_messages_user(fake_session, [999], new_user_id=42)
 
         assert count == 0
 
@@ -424,63 +449,53 @@ class TestGetAllUsersCostsByMonth:
     """Tests for get_all_users_costs_by_month function."""
 
     @pytest.mark.asyncio
-    async def test_empty_result(self, mock_session):
-        """Returns empty dict when no costs for month."""
-        from bot.db.repositories.messages import get_all_users_costs_by_month
-
-        mock_result = MagicMock()
-        mock_result.all.return_value = []
-        mock_session.execute.return_value = mock_result
-
-        totals = await get_all_users_costs_by_month(mock_session, year=2026, month=1)
+    @pytest.mark.parametrize("month", [0, 13])
+    async def test_returns_empty_for_invalid_month(self, fake_session, month):
+        """Out-of-range month yields an empty result without querying the DB."""
+        totals = await get_all_users_costs_by_month(fake_session, year=2026, month=month)
 
         assert totals == {}
+        fake_session.execute.assert_not_called()
 
     @pytest.mark.asyncio
-    async def test_returns_totals_by_user(self, mock_session):
+    async def test_returns_totals_by_user(self, fake_session):
         """Returns dict of user_id to total amount."""
-        from bot.db.repositories.messages import get_all_users_costs_by_month
-
         mock_result = MagicMock()
         mock_result.all.return_value = [
             MagicMock(user_id=123, text="Молоко 100"),
             MagicMock(user_id=123, text="Хлеб 50"),
             MagicMock(user_id=456, text="Яблоки 75"),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        totals = await get_all_users_costs_by_month(mock_session, year=2026, month=1)
+        totals = await get_all_users_costs_by_month(fake_session, year=2026, month=1)
 
         assert totals == {123: Decimal("150"), 456: Decimal("75")}
 
     @pytest.mark.asyncio
-    async def test_skips_invalid_format(self, mock_session):
+    async def test_skips_invalid_format(self, fake_session):
         """Skips messages with invalid format."""
-        from bot.db.repositories.messages import get_all_users_costs_by_month
-
         mock_result = MagicMock()
         mock_result.all.return_value = [
             MagicMock(user_id=123, text="Молоко 100"),
             MagicMock(user_id=123, text="Невалидная строка"),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        totals = await get_all_users_costs_by_month(mock_session, year=2026, month=1)
+        totals = await get_all_users_costs_by_month(fake_session, year=2026, month=1)
 
         assert totals == {123: Decimal("100")}
 
     @pytest.mark.asyncio
-    async def test_handles_comma_decimal(self, mock_session):
+    async def test_handles_comma_decimal(self, fake_session):
         """Handles comma as decimal separator."""
-        from bot.db.repositories.messages import get_all_users_costs_by_month
-
         mock_result = MagicMock()
         mock_result.all.return_value = [
             MagicMock(user_id=123, text="Молоко 100,50"),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        totals = await get_all_users_costs_by_month(mock_session, year=2026, month=1)
+        totals = await get_all_users_costs_by_month(fake_session, year=2026, month=1)
 
         assert totals == {123: Decimal("100.50")}
 
@@ -489,47 +504,30 @@ class TestGetAvailableMonths:
     """Tests for get_available_months function."""
 
     @pytest.mark.asyncio
-    async def test_empty_result(self, mock_session):
-        """Returns empty list when no data."""
-        from bot.db.repositories.messages import get_available_months
-
-        mock_result = MagicMock()
-        mock_result.all.return_value = []
-        mock_session.execute.return_value = mock_result
-
-        months = await get_available_months(mock_session)
-
-        assert months == []
-
-    @pytest.mark.asyncio
-    async def test_returns_year_month_tuples(self, mock_session):
+    async def test_returns_year_month_tuples(self, fake_session):
         """Returns list of (year, month) tuples for all users."""
-        from bot.db.repositories.messages import get_available_months
-
         mock_result = MagicMock()
         mock_result.all.return_value = [
             MagicMock(year=2026, month=1),
             MagicMock(year=2025, month=12),
             MagicMock(year=2025, month=11),
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        months = await get_available_months(mock_session)
+        months = await get_available_months(fake_session)
 
         assert months == [(2026, 1), (2025, 12), (2025, 11)]
 
     @pytest.mark.asyncio
-    async def test_converts_to_int(self, mock_session):
+    async def test_converts_to_int(self, fake_session):
         """Converts year and month to int."""
-        from bot.db.repositories.messages import get_available_months
-
         mock_result = MagicMock()
         mock_result.all.return_value = [
             MagicMock(year=2026.0, month=1.0),  # floats from DB
         ]
-        mock_session.execute.return_value = mock_result
+        fake_session.execute.return_value = mock_result
 
-        months = await get_available_months(mock_session)
+        months = await get_available_months(fake_session)
 
         assert months == [(2026, 1)]
         assert isinstance(months[0][0], int)
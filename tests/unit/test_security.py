@@ -1,32 +1,35 @@
 """Unit tests for bot/security.py password hashing utilities."""
 
+import pytest
+
 from bot.security import hash_password, verify_password
 
+_PASSWORDS = ["my_secret_password", "correct_password", "", "пароль"]
+
+
+@pytest.fixture(scope="module")
+def password_hashes():
+    """Hash each test password once and share the result across the module."""
+    return {password: hash_password(password) for password in _PASSWORDS}
 
-def test_hash_password_returns_bcrypt_hash():
+
+def test_hash_password_returns_bcrypt_hash(password_hashes):
     """Test that hash_password returns a bcrypt hash starting with $2b$."""
-    password = "test_password"
-    hashed = hash_password(password)
+    hashed = password_hashes["my_secret_password"]
 
     assert hashed.startswith("$2b$")
     assert len(hashed) > 50  # bcrypt hashes are typically 60 characters
 
 
-def test_verify_password_correct():
-    """Test that verify_password returns True for correct password."""
-    password = "my_secret_password"
-    hashed = hash_password(password)
-
-    assert verify_password(password, hashed) is True
+@pytest.mark.parametrize("password", _PASSWORDS, ids=["secret", "correct", "empty", "unicode"])
+def test_verify_password_correct(password, password_hashes):
+    """Test that verify_password returns True for correct password (incl. empty and unicode)."""
+    assert verify_password(password, password_hashes[password]) is True
 
 
-def test_verify_password_wrong():
+def test_verify_password_wrong(password_hashes):
     """Test that verify_password returns False for wrong password."""
-    password = "correct_password"
-    wrong_password = "wrong_password"
-    hashed = hash_password(password)
-
-    assert verify_password(wrong_password, hashed) is False
+    assert verify_password("wrong_password", password_hashes["correct_password"]) is False
 
 
 def test_hash_password_different_salts():
@@ -36,22 +39,8 @@ def test_hash_password_different_salts():
     hash2 = hash_password(password)
 
     assert hash1 != hash2
-    # But both should verify correctly
-    assert verify_password(password, hash1) is True
-    assert verify_password(password, hash2) is True
-
-
-def test_verify_password_empty_string():
-    """Test that empty password can be hashed and verified."""
-    password = ""
-    hashed = hash_password(password)
-
-    assert verify_password(password, hashed) is True
-
 
-def test_verify_password_unicode():
-    """Test that unicode passwords can be hashed and verified."""
-    password = "пароль"
-    hashed = hash_password(password)
 
-    assert verify_password(password, hashed) is True
+def test_hash_password_uses_configured_rounds():
+    """Test that hash_password takes its cost factor from _BCRYPT_ROUNDS (lowered to 4 in tests)."""
+    assert hash_password("any").startswith("$2b$04$")
@@ -15,6 +15,7 @@ from bot.db.repositories.users import (
     update_user,
     update_user_password,
 )
+from tests.unit.helpers import make_user
 
 
 @pytest.fixture
@@ -27,15 +28,21 @@ def mock_session():
     return session
 
 
-def _make_user(id=1, telegram_id=123, name="Иван", role="user", password_hash=None):
-    """Helper to create a mock User object."""
-    user = MagicMock()
-    user.id = id
-    user.telegram_id = telegram_id
-    user.name = name
-    user.role = role
-    user.password_hash = password_hash
-    return user
+_UNSET = object()
+
+
+def _execute_returning(*, scalars=_UNSET, scalar_one_or_none=_UNSET, scalar_one=_UNSET, rowcount=_UNSET):
+    """Helper: AsyncMock for session.execute whose result returns the given values."""
+    result_mock = MagicMock()
+    if scalars is not _UNSET:
+        result_mock.scalars.return_value.all.return_value = scalars
+    if scalar_one_or_none is not _UNSET:
+        result_mock.scalar_one_or_none.return_value = scalar_one_or_none
+    if scalar_one is not _UNSET:
+        result_mock.scalar_one.return_value = scalar_one
+    if rowcount is not _UNSET:
+        result_mock.rowcount = rowcount
+    return AsyncMock(return_value=result_mock)
 
 
 class TestGetAllUsers:
@@ -44,10 +51,8 @@ class TestGetAllUsers:
     @pytest.mark.asyncio
     async def test_returns_list_of_users(self, mock_session):
         """Returns list from query result."""
-        users = [_make_user(1, 111, "Алёна"), _make_user(2, 222, "Иван")]
-        result_mock = MagicMock()
-        result_mock.scalars.return_value.all.return_value = users
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        users = [make_user(1, 111, "Алёна"), make_user(2, 222, "Иван")]
+        mock_session.execute = _execute_returning(scalars=users)
 
         result = await get_all_users(mock_session)
 
@@ -57,9 +62,7 @@ class TestGetAllUsers:
     @pytest.mark.asyncio
     async def test_returns_empty_list_when_no_users(self, mock_session):
         """Returns empty list when table is empty."""
-        result_mock = MagicMock()
-        result_mock.scalars.return_value.all.return_value = []
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalars=[])
 
         result = await get_all_users(mock_session)
 
@@ -72,10 +75,8 @@ class TestGetUserById:
     @pytest.mark.asyncio
     async def test_returns_user_when_found(self, mock_session):
         """Returns user for valid ID."""
-        user = _make_user(1, 123, "Иван")
-        result_mock = MagicMock()
-        result_mock.scalar_one_or_none.return_value = user
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        user = make_user(1, 123, "Иван")
+        mock_session.execute = _execute_returning(scalar_one_or_none=user)
 
         result = await get_user_by_id(mock_session, 1)
 
@@ -84,9 +85,7 @@ class TestGetUserById:
     @pytest.mark.asyncio
     async def test_returns_none_when_not_found(self, mock_session):
         """Returns None for invalid ID."""
-        result_mock = MagicMock()
-        result_mock.scalar_one_or_none.return_value = None
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalar_one_or_none=None)
 
         result = await get_user_by_id(mock_session, 999)
 
@@ -99,10 +98,8 @@ class TestGetUserByTelegramId:
     @pytest.mark.asyncio
     async def test_returns_user_when_found(self, mock_session):
         """Returns user for valid telegram_id."""
-        user = _make_user(1, 12345, "Иван")
-        result_mock = MagicMock()
-        result_mock.scalar_one_or_none.return_value = user
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        user = make_user(1, 12345, "Иван")
+        mock_session.execute = _execute_returning(scalar_one_or_none=user)
 
         result = await get_user_by_telegram_id(mock_session, 12345)
 
@@ -111,9 +108,7 @@ class TestGetUserByTelegramId:
     @pytest.mark.asyncio
     async def test_returns_none_when_not_found(self, mock_session):
         """Returns None for unknown telegram_id."""
-        result_mock = MagicMock()
-        result_mock.scalar_one_or_none.return_value = None
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalar_one_or_none=None)
 
         result = await get_user_by_telegram_id(mock_session, 99999)
 
@@ -155,11 +150,9 @@ class TestUpdateUser:
     @pytest.mark.asyncio
     async def test_updates_and_returns_user(self, mock_session):
         """Updates existing user fields."""
-        existing = _make_user(1, 123, "Старое имя")
+        existing = make_user(1, 123, "Старое имя")
         # get_user_by_id calls session.execute internally
-        result_mock = MagicMock()
-        result_mock.scalar_one_or_none.return_value = existing
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalar_one_or_none=existing)
 
         result = await update_user(mock_session, user_id=1, telegram_id=456, name="Новое имя")
 
@@ -171,9 +164,7 @@ class TestUpdateUser:
     @pytest.mark.asyncio
     async def test_returns_none_when_not_found(self, mock_session):
         """Returns None when user doesn't exist."""
-        result_mock = MagicMock()
-        result_mock.scalar_one_or_none.return_value = None
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalar_one_or_none=None)
 
         result = await update_user(mock_session, user_id=999, telegram_id=456, name="Имя")
 
@@ -186,9 +177,7 @@ class TestDeleteUser:
     @pytest.mark.asyncio
     async def test_returns_true_when_deleted(self, mock_session):
         """Returns True when user is found and deleted."""
-        result_mock = MagicMock()
-        result_mock.rowcount = 1
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(rowcount=1)
 
         result = await delete_user(mock_session, user_id=1)
 
@@ -197,9 +186,7 @@ class TestDeleteUser:
     @pytest.mark.asyncio
     async def test_returns_false_when_not_found(self, mock_session):
         """Returns False when no rows affected."""
-        result_mock = MagicMock()
-        result_mock.rowcount = 0
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(rowcount=0)
 
         result = await delete_user(mock_session, user_id=999)
 
@@ -212,9 +199,7 @@ class TestGetAllTelegramIds:
     @pytest.mark.asyncio
     async def test_returns_list_of_ids(self, mock_session):
         """Returns ordered list of telegram IDs."""
-        result_mock = MagicMock()
-        result_mock.scalars.return_value.all.return_value = [111, 222, 333]
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalars=[111, 222, 333])
 
         result = await get_all_telegram_ids(mock_session)
 
@@ -223,9 +208,7 @@ class TestGetAllTelegramIds:
     @pytest.mark.asyncio
     async def test_returns_empty_list_when_no_users(self, mock_session):
         """Returns empty list when no users exist."""
-        result_mock = MagicMock()
-        result_mock.scalars.return_value.all.return_value = []
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalars=[])
 
         result = await get_all_telegram_ids(mock_session)
 
@@ -238,10 +221,8 @@ class TestUpdateUserPassword:
     @pytest.mark.asyncio
     async def test_updates_password_hash(self, mock_session):
         """Updates user password hash successfully."""
-        existing = _make_user(1, 123, "Иван", password_hash="old_hash")
-        result_mock = MagicMock()
-        result_mock.scalar_one_or_none.return_value = existing
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        existing = make_user(1, 123, "Иван", password_hash="old_hash")
+        mock_session.execute = _execute_returning(scalar_one_or_none=existing)
 
         result = await update_user_password(mock_session, user_id=1, password_hash="new_hash")
 
@@ -252,9 +233,7 @@ class TestUpdateUserPassword:
     @pytest.mark.asyncio
     async def test_returns_none_when_user_not_found(self, mock_session):
         """Returns None when user doesn't exist."""
-        result_mock = MagicMock()
-        result_mock.scalar_one_or_none.return_value = None
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalar_one_or_none=None)
 
         result = await update_user_password(mock_session, user_id=999, password_hash="new_hash")
 
@@ -267,9 +246,7 @@ class TestCountAdmins:
     @pytest.mark.asyncio
     async def test_returns_zero_when_no_admins(self, mock_session):
         """Returns 0 when there are no admins."""
-        result_mock = MagicMock()
-        result_mock.scalar_one.return_value = 0
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalar_one=0)
 
         result = await count_admins(mock_session)
 
@@ -278,9 +255,7 @@ class TestCountAdmins:
     @pytest.mark.asyncio
     async def test_returns_count_of_admins(self, mock_session):
         """Returns count of admin users."""
-        result_mock = MagicMock()
-        result_mock.scalar_one.return_value = 3
-        mock_session.execute = AsyncMock(return_value=result_mock)
+        mock_session.execute = _execute_returning(scalar_one=3)
 
         result = await count_admins(mock_session)
 
@@ -1,244 +1,214 @@
 """Unit tests for users management routes."""
 
 from contextlib import asynccontextmanager
-from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime
+from unittest.mock import AsyncMock
+from urllib.parse import urlencode
 
 import pytest
-from httpx import ASGITransport, AsyncClient
+from httpx import Request
+from sqlalchemy.exc import IntegrityError
 
-from bot.web.app import app
+import bot.web.users as users_mod
 from bot.web.auth import auth_sessions
+from tests.unit.helpers import aret, make_user
 
 
-def _make_user(id=1, telegram_id=123, name="Иван", role="user"):
-    user = MagicMock()
-    user.id = id
-    user.telegram_id = telegram_id
-    user.name = name
-    user.role = role
-    user.created_at = MagicMock()
-    user.created_at.strftime = MagicMock(return_value="01.01.2026 12:00")
-    return user
+def _araise(exc):
+    """Plain coroutine function raising exc: a cheap stand-in for AsyncMock(side_effect=exc)."""
 
+    async def _stub(*args, **kwargs):
+        raise exc
 
-@asynccontextmanager
-async def _mock_db_session():
-    yield AsyncMock()
+    return _stub
 
 
-def _setup_auth(role="admin", telegram_id=111, user_name="Админ"):
-    """Create an authenticated session and return (token, csrf_token).
+def _assert_redirect(response, path):
+    """Assert a 303 redirect whose location points at path."""
+    assert response.status_code == 303
+    assert path in response.headers["location"]
 
-    Args:
-        role: User role ('admin' or 'user')
-        telegram_id: User's telegram ID
-        user_name: User's display name
-    """
-    token = f"test-users-session-{role}"
-    csrf = "test-users-csrf"
-    from datetime import datetime
 
-    auth_sessions[token] = {
-        "authenticated": True,
-        "created_at": datetime.now(),
-        "csrf_token": csrf,
-        "role": role,
-        "telegram_id": telegram_id,
-        "user_name": user_name,
-    }
-    return token, csrf
+_DUPLICATE = IntegrityError("duplicate", None, Exception("duplicate"))
 
 
-def _cleanup_auth(token):
-    auth_sessions.pop(token, None)
+@pytest.fixture(autouse=True)
+def _patch_db_session(monkeypatch):
+    """Every users route test runs against its own fresh mock DB session."""
+    session = AsyncMock()
 
+    @asynccontextmanager
+    async def _mock_db_session():
+        yield session
 
-class TestUsersListRoute:
-    """Tests for GET /users."""
+    monkeypatch.setattr(users_mod, "get_db_session", _mock_db_session)
+    return session
 
-    @pytest.mark.asyncio
-    async def test_redirects_to_login_when_not_authenticated(self):
-        """Unauthenticated request redirects to /login."""
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/users", follow_redirects=False)
 
-        assert response.status_code == 303
-        assert "/login" in response.headers["location"]
+@pytest.fixture(scope="module", autouse=True)
+def _warm_templates():
+    """Compile the users templates once up front so no single test pays Jinja's lazy compile."""
+    for name in ("users/list.html", "users/form.html"):
+        users_mod.templates.get_template(name)
 
-    @pytest.mark.asyncio
-    async def test_returns_200_when_authenticated(self):
-        """Authenticated request returns users list page."""
-        token, _ = _setup_auth()
-        users = [_make_user(1, 111, "Алёна"), _make_user(2, 222, "Иван")]
 
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_all_users", new=AsyncMock(return_value=users)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.get("/users", cookies={"costs_session": token})
+@pytest.fixture(scope="module")
+def send(asgi_transport):
+    """Send one request straight through ASGITransport, bypassing AsyncClient (no cookie jar, no redirects)."""
 
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "Алёна" in response.text
-        assert "Иван" in response.text
+    async def _send(method, path, *, headers=None, content=None):
+        request = Request(method, f"http://test{path}", headers=headers, content=content)
+        response = await asgi_transport.handle_async_request(request)
+        await response.aread()
+        return response
 
-    @pytest.mark.asyncio
-    async def test_shows_empty_state_when_no_users(self):
-        """Shows empty message when no users exist."""
-        token, _ = _setup_auth()
+    return _send
 
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_all_users", new=AsyncMock(return_value=[])),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.get("/users", cookies={"costs_session": token})
 
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "Пользователей нет" in response.text
+# Response bodies are checked as bytes to skip decoding the whole page per assertion
+_ALENA = "Алёна".encode()
+_IVAN = "Иван".encode()
+_EMPTY = "Пользователей нет".encode()
 
+_REGULAR_USER = {"role": "user", "telegram_id": 222, "user_name": "Обычный"}
 
-class TestAddUserRoute:
-    """Tests for GET/POST /users/add."""
+_TOKEN = "test-users-session"
+_CSRF = "test-users-csrf"
+# Captured once at import; must stay recent because get_session() expires old sessions
+_AUTH_CREATED_AT = datetime.now()
 
-    @pytest.mark.asyncio
-    async def test_add_form_returns_200(self):
-        """Add user form returns 200 when authenticated."""
-        token, _ = _setup_auth()
+# Pre-built request headers: a raw cookie header instead of per-request cookie-jar updates
+_AUTH_HEADERS = {"cookie": f"costs_session={_TOKEN}"}
+_FORM_HEADERS = {"content-type": "application/x-www-form-urlencoded"}
+_AUTH_FORM_HEADERS = {**_AUTH_HEADERS, **_FORM_HEADERS}
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/users/add", cookies={"costs_session": token})
 
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "Добавить пользователя" in response.text
+def _form_body(**fields):
+    """URL-encode form fields plus the session CSRF token into a request body."""
+    return urlencode({**fields, "csrf_token": _CSRF}).encode()
 
-    @pytest.mark.asyncio
-    async def test_add_user_success(self):
-        """Successful user creation redirects to /users."""
-        token, csrf = _setup_auth()
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.create_user", new=AsyncMock()),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/add",
-                    cookies={"costs_session": token},
-                    data={"name": "Новый", "telegram_id": "999", "password": "test1234", "csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
 
-    @pytest.mark.asyncio
-    async def test_add_user_empty_name_shows_error(self):
-        """Empty name shows validation error."""
-        token, csrf = _setup_auth()
+_DELETE_BODY = _form_body()
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.post(
-                "/users/add",
-                cookies={"costs_session": token},
-                data={"name": "  ", "telegram_id": "999", "password": "test1234", "csrf_token": csrf},
-            )
 
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "Имя не может быть пустым" in response.text
+@pytest.fixture
+def auth(request):
+    """Authenticated admin session under _TOKEN; fields can be overridden via indirect parametrize."""
+    auth_sessions[_TOKEN] = {
+        "authenticated": True,
+        "created_at": _AUTH_CREATED_AT,
+        "csrf_token": _CSRF,
+        "role": "admin",
+        "telegram_id": 111,
+        "user_name": "Админ",
+        **getattr(request, "param", {}),
+    }
+    yield _TOKEN
+    auth_sessions.pop(_TOKEN, None)
 
-    @pytest.mark.asyncio
-    async def test_add_user_invalid_telegram_id_shows_error(self):
-        """Non-numeric telegram_id shows validation error."""
-        token, csrf = _setup_auth()
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.post(
-                "/users/add",
-                cookies={"costs_session": token},
-                data={"name": "Тест", "telegram_id": "abc", "password": "test1234", "csrf_token": csrf},
-            )
+class TestUsersListRoute:
+    """Tests for GET /users."""
+
+    async def test_redirects_to_login_when_not_authenticated(self, send):
+        """Unauthenticated request redirects to /login."""
+        response = await send("GET", "/users")
+
+        _assert_redirect(response, "/login")
+
+    async def test_returns_200_when_authenticated(self, client, auth, monkeypatch):
+        """Authenticated request returns users list page."""
+        users = [make_user(1, 111, "Алёна"), make_user(2, 222, "Иван")]
+
+        monkeypatch.setattr(users_mod, "get_all_users", aret(users))
+
+        response = await client.get("/users", headers=_AUTH_HEADERS)
 
-        _cleanup_auth(token)
         assert response.status_code == 200
-        assert "Telegram ID должен быть числом" in response.text
+        assert _ALENA in response.content
+        assert _IVAN in response.content
+        assert b"01.01.2026 12:00" in response.content  # created_at formatted by the template
 
-    @pytest.mark.asyncio
-    async def test_add_user_negative_telegram_id_shows_error(self):
-        """Negative telegram_id shows validation error."""
-        token, csrf = _setup_auth()
+    async def test_shows_empty_state_when_no_users(self, client, auth, monkeypatch):
+        """Shows empty message when no users exist."""
+        monkeypatch.setattr(users_mod, "get_all_users", aret([]))
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.post(
-                "/users/add",
-                cookies={"costs_session": token},
-                data={"name": "Тест", "telegram_id": "-5", "password": "test1234", "csrf_token": csrf},
-            )
+        response = await client.get("/users", headers=_AUTH_HEADERS)
 
-        _cleanup_auth(token)
         assert response.status_code == 200
-        assert "Telegram ID должен быть больше 0" in response.text
+        assert _EMPTY in response.content
 
-    @pytest.mark.asyncio
-    async def test_add_user_duplicate_telegram_id_shows_error(self):
-        """Duplicate telegram_id shows IntegrityError message."""
-        from sqlalchemy.exc import IntegrityError
 
-        token, csrf = _setup_auth()
+class TestAddUserRoute:
+    """Tests for GET/POST /users/add."""
 
-        async def raise_integrity(session, **kwargs):
-            raise IntegrityError("duplicate", None, Exception("duplicate"))
+    async def test_add_form_returns_200(self, client, auth):
+        """Add user form returns 200 when authenticated."""
+        response = await client.get("/users/add", headers=_AUTH_HEADERS)
 
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.create_user", side_effect=raise_integrity),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/add",
-                    cookies={"costs_session": token},
-                    data={"name": "Тест", "telegram_id": "123", "password": "test1234", "csrf_token": csrf},
-                )
+        assert response.status_code == 200
+        assert "Добавить пользователя".encode() in response.content
+
+    async def test_add_user_success(self, send, auth, monkeypatch):
+        """Successful user creation redirects to /users."""
+        monkeypatch.setattr(users_mod, "create_user", aret(make_user(3, 999, "Новый")))
+
+        response = await send(
+            "POST",
+            "/users/add",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Новый", telegram_id="999", password="test1234"),
+        )
+
+        _assert_redirect(response, "/users")
+
+    @pytest.mark.parametrize(
+        ("form", "message"),
+        [
+            pytest.param({"name": "  ", "telegram_id": "999"}, "Имя не может быть пустым", id="empty-name"),
+            pytest.param({"name": "Тест", "telegram_id": "abc"}, "Telegram ID должен быть числом", id="non-numeric-id"),
+            pytest.param({"name": "Тест", "telegram_id": "-5"}, "Telegram ID должен быть больше 0", id="negative-id"),
+            pytest.param(
+                {"name": "Тест", "telegram_id": "999", "password": "abc"}, "не менее 4 символов", id="short-password"
+            ),
+            pytest.param(
+                {"name": "Тест", "telegram_id": "999", "role": "invalid_role"}, "Некорректная роль", id="invalid-role"
+            ),
+        ],
+    )
+    async def test_add_user_validation_errors(self, client, auth, form, message):
+        """Invalid add-user form re-renders the page with a validation error."""
+        response = await client.post(
+            "/users/add",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(**{"password": "test1234", **form}),
+        )
 
-        _cleanup_auth(token)
         assert response.status_code == 200
-        assert "уже существует" in response.text
+        assert message.encode() in response.content
 
-    @pytest.mark.asyncio
-    async def test_add_user_short_password_shows_error(self):
-        """Password shorter than 4 characters shows validation error."""
-        token, csrf = _setup_auth()
+    async def test_add_user_duplicate_telegram_id_shows_error(self, client, auth, monkeypatch):
+        """Duplicate telegram_id shows IntegrityError message."""
+        monkeypatch.setattr(users_mod, "create_user", _araise(_DUPLICATE))
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.post(
-                "/users/add",
-                cookies={"costs_session": token},
-                data={"name": "Тест", "telegram_id": "999", "password": "abc", "csrf_token": csrf},
-            )
+        response = await client.post(
+            "/users/add",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Тест", telegram_id="123", password="test1234"),
+        )
 
-        _cleanup_auth(token)
         assert response.status_code == 200
-        assert "не менее 4 символов" in response.text
+        assert "уже существует".encode() in response.content
 
-    @pytest.mark.asyncio
-    async def test_add_user_missing_password_shows_error(self):
+    async def test_add_user_missing_password_shows_error(self, client, auth):
         """Missing password field shows validation error."""
-        token, csrf = _setup_auth()
+        response = await client.post(
+            "/users/add",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Тест", telegram_id="999"),
+            # password field is missing
+        )
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.post(
-                "/users/add",
-                cookies={"costs_session": token},
-                data={"name": "Тест", "telegram_id": "999", "csrf_token": csrf},
-                # password field is missing
-            )
-
-        _cleanup_auth(token)
         # FastAPI Form(...) validation should fail - expect 422
         assert response.status_code == 422
 
@@ -246,522 +216,266 @@ class TestAddUserRoute:
 class TestEditUserRoute:
     """Tests for GET/POST /users/{id}/edit."""
 
-    @pytest.mark.asyncio
-    async def test_edit_form_returns_200(self):
+    async def test_edit_form_returns_200(self, client, auth, monkeypatch):
         """Edit form returns 200 with user data prefilled."""
-        token, _ = _setup_auth()
-        user = _make_user(1, 123, "Иван")
+        user = make_user(1, 123, "Иван")
+
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(user))
 
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.get("/users/1/edit", cookies={"costs_session": token})
+        response = await client.get("/users/1/edit", headers=_AUTH_HEADERS)
 
-        _cleanup_auth(token)
         assert response.status_code == 200
-        assert "Иван" in response.text
-        assert "123" in response.text
+        assert _IVAN in response.content
+        assert b"123" in response.content
 
-    @pytest.mark.asyncio
-    async def test_edit_form_returns_404_when_not_found(self):
+    async def test_edit_form_returns_404_when_not_found(self, client, auth, monkeypatch):
         """Edit form returns 404 for unknown user."""
-        token, _ = _setup_auth()
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(None))
 
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=None)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.get("/users/999/edit", cookies={"costs_session": token})
+        response = await client.get("/users/999/edit", headers=_AUTH_HEADERS)
 
-        _cleanup_auth(token)
         assert response.status_code == 404
 
-    @pytest.mark.asyncio
-    async def test_edit_user_success(self):
+    async def test_edit_user_success(self, send, auth, monkeypatch):
         """Successful edit redirects to /users."""
-        token, csrf = _setup_auth()
-        user = _make_user(1, 123, "Иван")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-            patch("bot.web.users.update_user", new=AsyncMock(return_value=user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={"name": "Обновлённый", "telegram_id": "456", "csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
-
-    @pytest.mark.asyncio
-    async def test_edit_user_empty_name_shows_error(self):
-        """Edit with empty name re-renders form with error."""
-        token, csrf = _setup_auth()
-        user = _make_user(1, 123, "Иван")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={"name": "  ", "telegram_id": "123", "csrf_token": csrf},
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "Имя не может быть пустым" in response.text
-
-    @pytest.mark.asyncio
-    async def test_edit_user_invalid_telegram_id_shows_error(self):
-        """Edit with non-numeric telegram_id returns error."""
-        token, csrf = _setup_auth()
-        user = _make_user(1, 123, "Иван")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={"name": "Иван", "telegram_id": "xyz", "csrf_token": csrf},
-                )
-
-        _cleanup_auth(token)
+        user = make_user(1, 123, "Иван")
+
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(user))
+        monkeypatch.setattr(users_mod, "update_user", aret(user))
+
+        response = await send(
+            "POST",
+            "/users/1/edit",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Обновлённый", telegram_id="456"),
+        )
+
+        _assert_redirect(response, "/users")
+
+    @pytest.mark.parametrize(
+        ("form", "message"),
+        [
+            pytest.param({"name": "  ", "telegram_id": "123"}, "Имя не может быть пустым", id="empty-name"),
+            pytest.param({"name": "Иван", "telegram_id": "xyz"}, "Telegram ID должен быть числом", id="non-numeric-id"),
+            pytest.param(
+                {"name": "Иван", "telegram_id": "123", "role": "user", "new_password": "abc"},
+                "не менее 4 символов",
+                id="short-new-password",
+            ),
+        ],
+    )
+    async def test_edit_user_validation_errors(self, client, auth, monkeypatch, form, message):
+        """Invalid edit-user form re-renders the page with a validation error."""
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(make_user(1, 123, "Иван")))
+
+        response = await client.post("/users/1/edit", headers=_AUTH_FORM_HEADERS, content=_form_body(**form))
+
         assert response.status_code == 200
-        assert "Telegram ID должен быть числом" in response.text
+        assert message.encode() in response.content
 
-    @pytest.mark.asyncio
-    async def test_edit_user_duplicate_telegram_id_shows_error(self):
+    async def test_edit_user_duplicate_telegram_id_shows_error(self, client, auth, monkeypatch):
         """Edit with a telegram_id already taken by another user shows error."""
-        from sqlalchemy.exc import IntegrityError
-
-        token, csrf = _setup_auth()
-        user = _make_user(1, 123, "Иван")
-
-        async def raise_integrity(*args, **kwargs):
-            raise IntegrityError("duplicate", None, Exception("duplicate"))
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-            patch("bot.web.users.update_user", side_effect=raise_integrity),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={"name": "Иван", "telegram_id": "999", "csrf_token": csrf},
-                )
-
-        _cleanup_auth(token)
+        user = make_user(1, 123, "Иван")
+
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(user))
+        monkeypatch.setattr(users_mod, "update_user", _araise(_DUPLICATE))
+
+        response = await client.post(
+            "/users/1/edit",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Иван", telegram_id="999"),
+        )
+
         assert response.status_code == 200
-        assert "уже существует" in response.text
+        assert "уже существует".encode() in response.content
 
 
 class TestDeleteUserRoute:
     """Tests for POST /users/{id}/delete."""
 
-    @pytest.mark.asyncio
-    async def test_delete_user_success(self):
+    async def test_delete_user_success(self, send, auth, monkeypatch):
         """Successful delete redirects to /users."""
-        token, csrf = _setup_auth()
-        regular_user = _make_user(1, 123, "Иван", "user")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=regular_user)),
-            patch("bot.web.users.delete_user", new=AsyncMock(return_value=True)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/delete",
-                    cookies={"costs_session": token},
-                    data={"csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
+        regular_user = make_user(1, 123, "Иван", "user")
+
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(regular_user))
+        monkeypatch.setattr(users_mod, "delete_user", aret(True))
+
+        response = await send(
+            "POST",
+            "/users/1/delete",
+            headers=_AUTH_FORM_HEADERS,
+            content=_DELETE_BODY,
+        )
+
+        _assert_redirect(response, "/users")
 
-    @pytest.mark.asyncio
-    async def test_delete_user_not_found(self):
+    async def test_delete_user_not_found(self, client, auth, monkeypatch):
         """Returns 404 when user doesn't exist."""
-        token, csrf = _setup_auth()
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=None)),
-            patch("bot.web.users.delete_user", new=AsyncMock(return_value=False)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/999/delete",
-                    cookies={"costs_session": token},
-                    data={"csrf_token": csrf},
-                )
-
-        _cleanup_auth(token)
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(None))
+        monkeypatch.setattr(users_mod, "delete_user", aret(False))
+
+        response = await client.post(
+            "/users/999/delete",
+            headers=_AUTH_FORM_HEADERS,
+            content=_DELETE_BODY,
+        )
+
         assert response.status_code == 404
 
-    @pytest.mark.asyncio
-    async def test_delete_without_auth_redirects(self):
+    async def test_delete_without_auth_redirects(self, send):
         """Unauthenticated delete request redirects to login."""
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.post(
-                "/users/1/delete",
-                data={"csrf_token": "x"},
-                follow_redirects=False,
-            )
+        response = await send(
+            "POST",
+            "/users/1/delete",
+            headers=_FORM_HEADERS,
+            content=b"csrf_token=x",
+        )
 
-        assert response.status_code == 303
-        assert "/login" in response.headers["location"]
+        _assert_redirect(response, "/login")
 
 
 class TestRoleBasedAccess:
     """Tests for admin-only access to users management."""
 
-    @pytest.mark.asyncio
-    async def test_non_admin_redirected_from_users_list(self):
-        """Non-admin user is redirected from /users to /costs."""
-        token, _ = _setup_auth(role="user", telegram_id=222, user_name="Обычный")
+    @pytest.mark.parametrize("auth", [_REGULAR_USER], indirect=True)
+    @pytest.mark.parametrize(
+        ("method", "path", "headers", "content"),
+        [
+            pytest.param("GET", "/users", _AUTH_HEADERS, None, id="list"),
+            pytest.param("GET", "/users/add", _AUTH_HEADERS, None, id="add"),
+            pytest.param("GET", "/users/1/edit", _AUTH_HEADERS, None, id="edit"),
+            pytest.param("POST", "/users/1/delete", _AUTH_FORM_HEADERS, _DELETE_BODY, id="delete"),
+        ],
+    )
+    async def test_non_admin_redirected_to_costs(self, send, auth, monkeypatch, method, path, headers, content):
+        """Non-admin user is redirected from every users page to /costs before any DB access."""
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/users", cookies={"costs_session": token}, follow_redirects=False)
+        def _no_db():
+            raise AssertionError("admin guard must reject the request before opening a DB session")
 
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/costs" in response.headers["location"]
+        monkeypatch.setattr(users_mod, "get_db_session", _no_db)
 
-    @pytest.mark.asyncio
-    async def test_non_admin_redirected_from_add_user(self):
-        """Non-admin user is redirected from /users/add to /costs."""
-        token, _ = _setup_auth(role="user", telegram_id=222, user_name="Обычный")
+        response = await send(method, path, headers=headers, content=content)
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.get("/users/add", cookies={"costs_session": token}, follow_redirects=False)
+        _assert_redirect(response, "/costs")
+
+    async def test_admin_can_access_users_list(self, client, auth, monkeypatch):
+        """Admin user can access /users and sees the role column."""
+        users = [make_user(1, 111, "Админ", "admin"), make_user(2, 222, "Пользователь", "user")]
+
+        monkeypatch.setattr(users_mod, "get_all_users", aret(users))
+
+        response = await client.get("/users", headers=_AUTH_HEADERS)
 
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/costs" in response.headers["location"]
-
-    @pytest.mark.asyncio
-    async def test_non_admin_redirected_from_edit_user(self):
-        """Non-admin user is redirected from /users/{id}/edit to /costs."""
-        token, _ = _setup_auth(role="user", telegram_id=222, user_name="Обычный")
-        user = _make_user(1, 123, "Иван", "user")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.get("/users/1/edit", cookies={"costs_session": token}, follow_redirects=False)
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/costs" in response.headers["location"]
-
-    @pytest.mark.asyncio
-    async def test_non_admin_redirected_from_delete_user(self):
-        """Non-admin user is redirected from delete action to /costs."""
-        token, csrf = _setup_auth(role="user", telegram_id=222, user_name="Обычный")
-
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.post(
-                "/users/1/delete",
-                cookies={"costs_session": token},
-                data={"csrf_token": csrf},
-                follow_redirects=False,
-            )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/costs" in response.headers["location"]
-
-    @pytest.mark.asyncio
-    async def test_admin_can_access_users_list(self):
-        """Admin user can access /users."""
-        token, _ = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        users = [_make_user(1, 111, "Админ", "admin"), _make_user(2, 222, "Пользователь", "user")]
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_all_users", new=AsyncMock(return_value=users)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.get("/users", cookies={"costs_session": token})
-
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "Пользователи" in response.text
-
-    @pytest.mark.asyncio
-    async def test_users_list_shows_role_column(self):
-        """Users list displays role column for each user."""
-        token, _ = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        users = [_make_user(1, 111, "Админ", "admin"), _make_user(2, 222, "Пользователь", "user")]
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_all_users", new=AsyncMock(return_value=users)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.get("/users", cookies={"costs_session": token})
-
-        _cleanup_auth(token)
         assert response.status_code == 200
-        assert "Роль" in response.text  # Header
+        body = response.content
+        assert "Пользователи".encode() in body
+        assert "Роль".encode() in body  # Header
 
-    @pytest.mark.asyncio
-    async def test_add_user_with_role(self):
+    async def test_add_user_with_role(self, send, auth, monkeypatch):
         """Admin can add user with role."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        new_user = _make_user(3, 333, "Новый", "user")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.create_user", new=AsyncMock(return_value=new_user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/add",
-                    cookies={"costs_session": token},
-                    data={"name": "Новый", "telegram_id": "333", "role": "admin", "password": "test1234", "csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
+        new_user = make_user(3, 333, "Новый", "user")
 
-    @pytest.mark.asyncio
-    async def test_add_user_invalid_role_shows_error(self):
-        """Invalid role shows validation error."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
+        monkeypatch.setattr(users_mod, "create_user", aret(new_user))
 
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            response = await client.post(
-                "/users/add",
-                cookies={"costs_session": token},
-                data={"name": "Тест", "telegram_id": "999", "role": "invalid_role", "password": "test1234", "csrf_token": csrf},
-            )
+        response = await send(
+            "POST",
+            "/users/add",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Новый", telegram_id="333", role="admin", password="test1234"),
+        )
 
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "Некорректная роль" in response.text
+        _assert_redirect(response, "/users")
 
-    @pytest.mark.asyncio
-    async def test_edit_user_with_role(self):
+    async def test_edit_user_with_role(self, send, auth, monkeypatch):
         """Admin can edit user role."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        user = _make_user(1, 123, "Иван", "user")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-            patch("bot.web.users.update_user", new=AsyncMock(return_value=user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={"name": "Иван", "telegram_id": "123", "role": "admin", "csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
+        user = make_user(1, 123, "Иван", "user")
+
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(user))
+        monkeypatch.setattr(users_mod, "update_user", aret(user))
 
-    @pytest.mark.asyncio
-    async def test_edit_user_with_new_password(self):
+        response = await send(
+            "POST",
+            "/users/1/edit",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Иван", telegram_id="123", role="admin"),
+        )
+
+        _assert_redirect(response, "/users")
+
+    async def test_edit_user_with_new_password(self, send, auth, monkeypatch):
         """Admin can reset user password via edit form."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        user = _make_user(1, 123, "Иван", "user")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-            patch("bot.web.users.update_user", new=AsyncMock(return_value=user)),
-            patch("bot.web.users.update_user_password", new=AsyncMock(return_value=user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={
-                        "name": "Иван",
-                        "telegram_id": "123",
-                        "role": "user",
-                        "new_password": "new_pass_123",
-                        "csrf_token": csrf,
-                    },
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
+        user = make_user(1, 123, "Иван", "user")
+
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(user))
+        monkeypatch.setattr(users_mod, "update_user", aret(user))
+        monkeypatch.setattr(users_mod, "update_user_password", aret(user))
+
+        response = await send(
+            "POST",
+            "/users/1/edit",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Иван", telegram_id="123", role="user", new_password="new_pass_123"),
+        )
 
-    @pytest.mark.asyncio
-    async def test_edit_user_empty_new_password_leaves_unchanged(self):
+        _assert_redirect(response, "/users")
+
+    async def test_edit_user_empty_new_password_leaves_unchanged(self, send, auth, monkeypatch):
         """Empty new_password field does not change password."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        user = _make_user(1, 123, "Иван", "user")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-            patch("bot.web.users.update_user", new=AsyncMock(return_value=user)),
-            patch("bot.web.users.update_user_password", new=AsyncMock(return_value=user)) as mock_update_pwd,
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={"name": "Иван", "telegram_id": "123", "role": "user", "new_password": "", "csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
+        user = make_user(1, 123, "Иван", "user")
+
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(user))
+        monkeypatch.setattr(users_mod, "update_user", aret(user))
+        mock_update_pwd = AsyncMock(return_value=user)
+        monkeypatch.setattr(users_mod, "update_user_password", mock_update_pwd)
+
+        response = await send(
+            "POST",
+            "/users/1/edit",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Иван", telegram_id="123", role="user", new_password=""),
+        )
+
         assert response.status_code == 303
         mock_update_pwd.assert_not_called()
 
-    @pytest.mark.asyncio
-    async def test_edit_user_short_new_password_shows_error(self):
-        """New password shorter than 4 characters shows validation error."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        user = _make_user(1, 123, "Иван", "user")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={
-                        "name": "Иван",
-                        "telegram_id": "123",
-                        "role": "user",
-                        "new_password": "abc",  # Too short
-                        "csrf_token": csrf,
-                    },
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "не менее 4 символов" in response.text
-
-    @pytest.mark.asyncio
-    async def test_delete_last_admin_shows_error(self):
-        """Deleting the only admin shows error and redirects."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        admin_user = _make_user(1, 111, "Админ", "admin")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=admin_user)),
-            patch("bot.web.users.count_admins", new=AsyncMock(return_value=1)),
-            patch("bot.web.users.delete_user", new=AsyncMock()) as mock_delete,
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/delete",
-                    cookies={"costs_session": token},
-                    data={"csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
-        mock_delete.assert_not_called()
-
-    @pytest.mark.asyncio
-    async def test_delete_non_last_admin_succeeds(self):
-        """Deleting one of multiple admins succeeds."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        admin_user = _make_user(1, 111, "Админ", "admin")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=admin_user)),
-            patch("bot.web.users.count_admins", new=AsyncMock(return_value=2)),
-            patch("bot.web.users.delete_user", new=AsyncMock(return_value=True)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/delete",
-                    cookies={"costs_session": token},
-                    data={"csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
-
-    @pytest.mark.asyncio
-    async def test_demote_last_admin_shows_error(self):
-        """Changing last admin's role to user shows error."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        admin_user = _make_user(1, 111, "Админ", "admin")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=admin_user)),
-            patch("bot.web.users.count_admins", new=AsyncMock(return_value=1)),
-            patch("bot.web.users.update_user", new=AsyncMock()) as mock_update,
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={"name": "Админ", "telegram_id": "111", "role": "user", "csrf_token": csrf},
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 200
-        assert "единственного администратора" in response.text
-        mock_update.assert_not_called()
-
-    @pytest.mark.asyncio
-    async def test_demote_non_last_admin_succeeds(self):
-        """Changing one of multiple admins to user succeeds."""
-        token, csrf = _setup_auth(role="admin", telegram_id=111, user_name="Админ")
-        admin_user = _make_user(1, 222, "Второй админ", "admin")
-
-        with (
-            patch("bot.web.users.get_db_session", side_effect=_mock_db_session),
-            patch("bot.web.users.get_user_by_id", new=AsyncMock(return_value=admin_user)),
-            patch("bot.web.users.count_admins", new=AsyncMock(return_value=2)),  # Two admins
-            patch("bot.web.users.update_user", new=AsyncMock(return_value=admin_user)),
-        ):
-            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-                response = await client.post(
-                    "/users/1/edit",
-                    cookies={"costs_session": token},
-                    data={"name": "Второй админ", "telegram_id": "222", "role": "user", "csrf_token": csrf},
-                    follow_redirects=False,
-                )
-
-        _cleanup_auth(token)
-        assert response.status_code == 303
-        assert "/users" in response.headers["location"]
+    @pytest.mark.parametrize(
+        ("admins", "deleted"), [pytest.param(1, False, id="last-admin"), pytest.param(2, True, id="one-of-several")]
+    )
+    async def test_delete_admin(self, send, auth, monkeypatch, admins, deleted):
+        """Deleting an admin redirects to /users but only goes through if another admin remains."""
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(make_user(1, 111, "Админ", "admin")))
+        monkeypatch.setattr(users_mod, "count_admins", aret(admins))
+        mock_delete = AsyncMock(return_value=True)
+        monkeypatch.setattr(users_mod, "delete_user", mock_delete)
+
+        response = await send("POST", "/users/1/delete", headers=_AUTH_FORM_HEADERS, content=_DELETE_BODY)
+
+        _assert_redirect(response, "/users")
+        assert mock_delete.called is deleted
+
+    @pytest.mark.parametrize(
+        ("admins", "updated"), [pytest.param(1, False, id="last-admin"), pytest.param(2, True, id="one-of-several")]
+    )
+    async def test_demote_admin(self, send, auth, monkeypatch, admins, updated):
+        """Changing an admin's role to user is refused for the last admin and succeeds otherwise."""
+        admin_user = make_user(1, 111, "Админ", "admin")
+
+        monkeypatch.setattr(users_mod, "get_user_by_id", aret(admin_user))
+        monkeypatch.setattr(users_mod, "count_admins", aret(admins))
+        mock_update = AsyncMock(return_value=admin_user)
+        monkeypatch.setattr(users_mod, "update_user", mock_update)
+
+        response = await send(
+            "POST",
+            "/users/1/edit",
+            headers=_AUTH_FORM_HEADERS,
+            content=_form_body(name="Админ", telegram_id="111", role="user"),
+        )
+
+        if updated:
+            _assert_redirect(response, "/users")
+        else:
+            assert response.status_code == 200
+            assert "единственного администратора".encode() in response.content
+        assert mock_update.called is updated
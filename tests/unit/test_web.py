@@ -3,15 +3,17 @@
 import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 
+from bot.db.models import Message
 from bot.web.app import app, generate_import_token, import_sessions
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def client():
-    """Create test client."""
+    """Test client shared across the module (import routes set no cookies)."""
     return TestClient(app)
 
 
@@ -26,16 +28,31 @@ class TestHealthEndpoint:
         assert response.json() == {"status": "ok"}
 
 
+class TestAppLifespan:
+    """Tests for app startup/shutdown hooks."""
+
+    def test_app_has_no_startup_or_shutdown_handlers(self):
+        """App needs no lifespan events: httpx ASGITransport in route tests never sends them."""
+        assert app.router.on_startup == []
+        assert app.router.on_shutdown == []
+
+
+@pytest.fixture(autouse=True)
+def _drop_new_import_sessions():
+    """Remove every import session a test created, even if it failed before cleaning up."""
+    existing = set(import_sessions)
+    yield
+    for token in import_sessions.keys() - existing:
+        del import_sessions[token]
+
+
 @pytest.fixture
 def valid_token():
     """Generate valid import token."""
-    token = generate_import_token(user_id=123456)
-    yield token
-    # Cleanup
-    import_sessions.pop(token, None)
+    return generate_import_token(user_id=123456)
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_json():
     """Sample VkusVill export JSON."""
     return {
@@ -87,6 +104,28 @@ def sample_json():
     }
 
 
+@pytest.fixture(scope="module")
+def sample_upload(sample_json):
+    """sample_json as a multipart file upload, encoded once: kwargs for client.post()."""
+    request = httpx.Request(
+        "POST",
+        "http://testserver",
+        files={"file": ("checks.json", json.dumps(sample_json).encode(), "application/json")},
+    )
+    return {"content": request.read(), "headers": {"content-type": request.headers["content-type"]}}
+
+
+@pytest.fixture
+def uploaded_token(client, valid_token, sample_upload):
+    """Import token with sample_json already uploaded."""
+    client.post(
+        f"/import/{valid_token}/upload",
+        **sample_upload,
+        follow_redirects=False,
+    )
+    return valid_token
+
+
 class TestDevRoute:
     """Tests for dev-only route."""
 
@@ -99,11 +138,6 @@ class TestDevRoute:
         assert "token" in data
         assert "url" in data
 
-        # Cleanup
-        from bot.web.app import import_sessions
-
-        import_sessions.pop(data["token"], None)
-
     def test_dev_route_returns_valid_token(self, client):
         """Dev route returns working token."""
         response = client.get("/dev/create-token/999")
@@ -113,11 +147,6 @@ class TestDevRoute:
         upload_response = client.get(f"/import/{data['token']}")
         assert upload_response.status_code == 200
 
-        # Cleanup
-        from bot.web.app import import_sessions
-
-        import_sessions.pop(data["token"], None)
-
 
 class TestGenerateImportToken:
     """Tests for token generation."""
@@ -129,10 +158,6 @@ class TestGenerateImportToken:
 
         assert token1 != token2
 
-        # Cleanup
-        import_sessions.pop(token1, None)
-        import_sessions.pop(token2, None)
-
     def test_stores_user_id_in_session(self):
         """Token session contains user_id."""
         token = generate_import_token(user_id=999)
@@ -140,9 +165,6 @@ class TestGenerateImportToken:
         assert token in import_sessions
         assert import_sessions[token]["user_id"] == 999
 
-        # Cleanup
-        import_sessions.pop(token, None)
-
     def test_session_has_created_at(self):
         """Token session has creation timestamp."""
         token = generate_import_token(user_id=123)
@@ -150,9 +172,6 @@ class TestGenerateImportToken:
         assert "created_at" in import_sessions[token]
         assert import_sessions[token]["created_at"] is not None
 
-        # Cleanup
-        import_sessions.pop(token, None)
-
 
 class TestUploadPage:
     """Tests for upload page."""
@@ -162,7 +181,7 @@ class TestUploadPage:
         response = client.get(f"/import/{valid_token}")
 
         assert response.status_code == 200
-        assert "Загрузите файл" in response.text
+        assert "Загрузите файл".encode() in response.content
 
     def test_returns_404_with_invalid_token(self, client):
         """Upload page returns 404 for invalid token."""
@@ -174,20 +193,18 @@ class TestUploadPage:
         """Page contains file upload form."""
         response = client.get(f"/import/{valid_token}")
 
-        assert 'type="file"' in response.text
-        assert 'accept=".json"' in response.text
+        assert b'type="file"' in response.content
+        assert b'accept=".json"' in response.content
 
 
 class TestFileUpload:
     """Tests for JSON file upload."""
 
-    def test_upload_valid_json(self, client, valid_token, sample_json):
+    def test_upload_valid_json(self, client, valid_token, sample_upload):
         """Uploading valid JSON redirects to select page."""
-        json_content = json.dumps(sample_json).encode()
-
         response = client.post(
             f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
+            **sample_upload,
             follow_redirects=False,
         )
 
@@ -202,7 +219,7 @@ class TestFileUpload:
         )
 
         assert response.status_code == 200
-        assert "Ошибка чтения файла" in response.text
+        assert "Ошибка чтения файла".encode() in response.content
 
     def test_upload_json_without_checks(self, client, valid_token):
         """Uploading JSON without 'checks' key shows error."""
@@ -214,15 +231,13 @@ class TestFileUpload:
         )
 
         assert response.status_code == 200
-        assert "Неверный формат файла" in response.text
+        assert "Неверный формат файла".encode() in response.content
 
-    def test_upload_stores_data_in_session(self, client, valid_token, sample_json):
+    def test_upload_stores_data_in_session(self, client, valid_token, sample_json, sample_upload):
         """Uploaded data is stored in session."""
-        json_content = json.dumps(sample_json).encode()
-
         client.post(
             f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
+            **sample_upload,
             follow_redirects=False,
         )
 
@@ -232,21 +247,12 @@ class TestFileUpload:
 class TestSelectPage:
     """Tests for check/item selection page."""
 
-    def test_returns_200_with_data(self, client, valid_token, sample_json):
+    def test_returns_200_with_data(self, client, uploaded_token):
         """Select page accessible when data is uploaded."""
-        # First upload
-        json_content = json.dumps(sample_json).encode()
-        client.post(
-            f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
-            follow_redirects=False,
-        )
-
-        # Then access select page
-        response = client.get(f"/import/{valid_token}/select")
+        response = client.get(f"/import/{uploaded_token}/select")
 
         assert response.status_code == 200
-        assert "Выберите товары" in response.text
+        assert "Выберите товары".encode() in response.content
 
     def test_redirects_without_data(self, client, valid_token):
         """Select page redirects to upload if no data."""
@@ -254,36 +260,22 @@ class TestSelectPage:
 
         assert response.status_code == 307
 
-    def test_shows_all_checks(self, client, valid_token, sample_json):
+    def test_shows_all_checks(self, client, uploaded_token):
         """Select page displays all checks."""
-        json_content = json.dumps(sample_json).encode()
-        client.post(
-            f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
-            follow_redirects=False,
-        )
-
-        response = client.get(f"/import/{valid_token}/select")
+        response = client.get(f"/import/{uploaded_token}/select")
 
-        assert "Москва б-р Осенний" in response.text
-        assert "Москва Рублёвское" in response.text
-        assert "335" in response.text
-        assert "238" in response.text
+        assert "Москва б-р Осенний".encode() in response.content
+        assert "Москва Рублёвское".encode() in response.content
+        assert b"335" in response.content
+        assert b"238" in response.content
 
-    def test_shows_all_items(self, client, valid_token, sample_json):
+    def test_shows_all_items(self, client, uploaded_token):
         """Select page displays all items."""
-        json_content = json.dumps(sample_json).encode()
-        client.post(
-            f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
-            follow_redirects=False,
-        )
-
-        response = client.get(f"/import/{valid_token}/select")
+        response = client.get(f"/import/{uploaded_token}/select")
 
-        assert "Напиток на пихтовой воде" in response.text
-        assert "Вафли Голландские" in response.text
-        assert "Молоко 2,5%" in response.text
+        assert "Напиток на пихтовой воде".encode() in response.content
+        assert "Вафли Голландские".encode() in response.content
+        assert "Молоко 2,5%".encode() in response.content
 
 
 @pytest.fixture
@@ -292,25 +284,18 @@ def mock_db_session():
     mock_session = MagicMock()
     mock_session.commit = AsyncMock()
     mock_session.rollback = AsyncMock()
-    mock_session.flush = AsyncMock()
-    mock_session.refresh = AsyncMock()
-    mock_session.add = MagicMock()
+    # save_message делает INSERT ... RETURNING и читает результат через scalar_one()
+    mock_result = MagicMock()
+    mock_result.scalar_one.return_value = MagicMock(spec=Message)
+    mock_session.execute = AsyncMock(return_value=mock_result)
     return mock_session
 
 
 class TestSaveSelected:
     """Tests for saving selected items."""
 
-    def test_save_selected_items(self, client, valid_token, sample_json, mock_db_session):
+    def test_save_selected_items(self, client, uploaded_token, mock_db_session):
         """Saving selected items shows success page."""
-        # Upload
-        json_content = json.dumps(sample_json).encode()
-        client.post(
-            f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
-            follow_redirects=False,
-        )
-
         # Mock the database session
         with patch("bot.web.app.get_db_session") as mock_get_session:
             mock_get_session.return_value.__aenter__ = AsyncMock(return_value=mock_db_session)
@@ -318,68 +303,49 @@ class TestSaveSelected:
 
             # Save selected items (first item from first check, second from second)
             response = client.post(
-                f"/import/{valid_token}/save",
+                f"/import/{uploaded_token}/save",
                 data={"items": ["0:0", "1:1"]},
             )
 
         assert response.status_code == 200
-        assert "Данные сохранены" in response.text
-        assert "2" in response.text  # 2 items saved
+        assert "Данные сохранены".encode() in response.content
+        assert b"2" in response.content  # 2 items saved
+        assert mock_db_session.execute.await_count == 2
+        mock_db_session.commit.assert_awaited_once()
 
-    def test_save_no_items_shows_error(self, client, valid_token, sample_json):
+    def test_save_no_items_shows_error(self, client, uploaded_token):
         """Saving with no selection shows error."""
-        json_content = json.dumps(sample_json).encode()
-        client.post(
-            f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
-            follow_redirects=False,
-        )
-
         response = client.post(
-            f"/import/{valid_token}/save",
+            f"/import/{uploaded_token}/save",
             data={},
         )
 
         assert response.status_code == 200
-        assert "Выберите хотя бы один товар" in response.text
+        assert "Выберите хотя бы один товар".encode() in response.content
 
-    def test_save_clears_session_data(self, client, valid_token, sample_json, mock_db_session):
+    def test_save_clears_session_data(self, client, uploaded_token, mock_db_session):
         """After save, session data is cleared."""
-        json_content = json.dumps(sample_json).encode()
-        client.post(
-            f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
-            follow_redirects=False,
-        )
-
         with patch("bot.web.app.get_db_session") as mock_get_session:
             mock_get_session.return_value.__aenter__ = AsyncMock(return_value=mock_db_session)
             mock_get_session.return_value.__aexit__ = AsyncMock(return_value=None)
 
             client.post(
-                f"/import/{valid_token}/save",
+                f"/import/{uploaded_token}/save",
                 data={"items": ["0:0"]},
             )
 
-        assert import_sessions[valid_token]["data"] is None
+        assert import_sessions[uploaded_token]["data"] is None
 
-    def test_save_calculates_total(self, client, valid_token, sample_json, mock_db_session):
+    def test_save_calculates_total(self, client, uploaded_token, mock_db_session):
         """Success page shows correct total amount."""
-        json_content = json.dumps(sample_json).encode()
-        client.post(
-            f"/import/{valid_token}/upload",
-            files={"file": ("checks.json", json_content, "application/json")},
-            follow_redirects=False,
-        )
-
         with patch("bot.web.app.get_db_session") as mock_get_session:
             mock_get_session.return_value.__aenter__ = AsyncMock(return_value=mock_db_session)
             mock_get_session.return_value.__aexit__ = AsyncMock(return_value=None)
 
             # Select items with sum 109 + 96 = 205
             response = client.post(
-                f"/import/{valid_token}/save",
+                f"/import/{uploaded_token}/save",
                 data={"items": ["0:0", "1:1"]},
             )
 
-        assert "205" in response.text
+        assert b"205" in response.content